@@ -0,0 +1,155 @@
+# SVG assets such as the logo engraved on the base. Each file is read
+# and parsed once per process and kept until it changes on disk, so a
+# batch that embeds the same logo in every part reads it only once.
+
+import os
+import re
+
+# Length units an SVG width or height can be given in, in user units
+# (pixels at 96 dpi). Percentages are resolved from the viewBox.
+UNITS = {'': 1.0, 'px': 1.0, 'pt': 4 / 3, 'pc': 16.0, 'mm': 96 / 25.4, 'cm': 96 / 2.54, 'in': 96.0}
+
+# What can come before the root element: a byte order mark, white space,
+# the XML declaration and other processing instructions, comments and a
+# doctype, with or without an internal subset. The root is only looked
+# for after these, so an <svg inside a comment is not taken for it.
+_PROLOG = re.compile(r'\ufeff?(?:\s+|<\?.*?\?>|<!--.*?-->|<!DOCTYPE(?:[^\[>]|\[.*?\])*>)*', re.S)
+_ROOT = re.compile(r'<svg\b([^>]*)>')
+_ATTRIBUTE = re.compile(r'(?:^|\s)([\w:.-]+)\s*=\s*(["\'])(.*?)\2', re.S)
+_LENGTH = re.compile(r'\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*([a-z%]*)\s*$')
+
+# Parsed assets by absolute path, with the mtime they were read at
+_assets = {}
+
+
+# Get the attributes of an SVG element's start tag as a dictionary
+def parse_attributes(tag):
+    return {name: value for name, _, value in _ATTRIBUTE.findall(tag)}
+
+
+# Get a length in user units, or None for a percentage or a missing value
+def parse_length(value):
+    if value is None:
+        return None
+    match = _LENGTH.match(value)
+    if match is None:
+        raise ValueError(f"Invalid SVG length: {value}")
+    number, unit = match.groups()
+    if unit == '%':
+        return None
+    if unit not in UNITS:
+        raise ValueError(f"Unknown SVG length unit: {unit}")
+    return float(number) * UNITS[unit]
+
+
+# A parsed SVG file: its source, the size of its root element, its
+# viewBox and preserveAspectRatio, the namespaces it declares and the
+# code inside the root element
+class Logo:
+    def __init__(self, path, source, mtime=None):
+        self.path = path
+        self.source = source
+        self.mtime = mtime
+        root = _ROOT.match(source, _PROLOG.match(source).end())
+        if root is None:
+            raise ValueError(f"{path} has no <svg> root element")
+        tag = root.group(1)
+        attributes = parse_attributes(tag)
+        self.view_box = attributes.get('viewBox')
+        self.preserve_aspect_ratio = attributes.get('preserveAspectRatio')
+        self.namespaces = {name: value for name, value in attributes.items() if name.startswith('xmlns:')}
+        box = None
+        if self.view_box is not None:
+            box = [float(v) for v in self.view_box.replace(',', ' ').split()]
+            if len(box) != 4:
+                raise ValueError(f"Invalid viewBox in {path}: {self.view_box}")
+        width = parse_length(attributes.get('width'))
+        height = parse_length(attributes.get('height'))
+        if width is None or height is None:
+            if box is None:
+                raise ValueError(f"{path} has no width and height or viewBox")
+            width = box[2] if width is None else width
+            height = box[3] if height is None else height
+        self.width = width
+        self.height = height
+        if tag.rstrip().endswith('/'):
+            self.body = ''
+        else:
+            self.body = source[root.end():source.rindex('</svg>')].strip()
+
+    # Get the SVG code that defines the logo once as a symbol
+    def symbol(self, name):
+        view_box = self.view_box or f'0 0 {self.width} {self.height}'
+        attributes = f'id="{name}" viewBox="{view_box}"'
+        if self.preserve_aspect_ratio is not None:
+            attributes += f' preserveAspectRatio="{self.preserve_aspect_ratio}"'
+        for prefix, uri in self.namespaces.items():
+            attributes += f' {prefix}="{uri}"'
+        return f'<symbol {attributes}>\n{self.body}\n</symbol>\n'
+
+    # Get the SVG code that places the symbol with its top left corner
+    # at (x, y), scaled by scaling_factor
+    def use(self, name, x, y, scaling_factor):
+        return f'<use xlink:href="#{name}" transform="translate({x}, {y}) scale({scaling_factor})" ' \
+               f'width="{self.width}" height="{self.height}"/>\n'
+
+
+# Get the parsed logo at a path. The file is only read again when its
+# modification time changes.
+def load_logo(path):
+    key = os.path.abspath(path)
+    mtime = os.stat(key).st_mtime_ns
+    logo = _assets.get(key)
+    if logo is None or logo.mtime != mtime:
+        with open(key, "r") as file:
+            logo = Logo(path, file.read(), mtime)
+        _assets[key] = logo
+    return logo
+
+
+# Get the version of the file at a path: its modification time, or None
+# when there is no such file. Results built from an asset are stale once
+# its version changes.
+def asset_version(path):
+    if path is None:
+        return None
+    try:
+        return os.stat(os.path.abspath(path)).st_mtime_ns
+    except OSError:
+        return None
+
+
+# Drop every cached asset
+def clear_assets():
+    _assets.clear()
+
+
+# The SVG code of a logo placed on a part, as returned by
+# Component.embed_logo. It is the logo inlined in a group, and also
+# remembers the logo and where it is so a document can write the logo
+# once as a symbol and place it with <use>.
+class PlacedLogo(str):
+    def __new__(cls, logo, x, y, scaling_factor):
+        code = f'<g transform="translate({x}, {y}) scale({scaling_factor})">\n{logo.source}\n</g>\n'
+        placed = super().__new__(cls, code)
+        placed.logo = logo
+        placed.x = x
+        placed.y = y
+        placed.scaling_factor = scaling_factor
+        return placed
+
+
+# Get the <defs> code with one symbol per logo placed in parts, and
+# parts with every placed logo replaced by a <use> of its symbol
+def logo_symbols(parts):
+    names = {}
+    replaced = []
+    for part in parts:
+        if isinstance(part, PlacedLogo):
+            name = names.setdefault(part.logo, f'logo{len(names) + 1}')
+            part = part.logo.use(name, part.x, part.y, part.scaling_factor)
+        replaced.append(part)
+    if not names:
+        return '', replaced
+    defs = '<defs>\n' + ''.join(logo.symbol(name) for logo, name in names.items()) + '</defs>\n'
+    return defs, replaced
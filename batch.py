@@ -0,0 +1,277 @@
+import argparse
+import csv
+import json
+import math
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import cutplan
+import nesting
+import profiling
+import svgpath
+import validate
+from component import write_svg_document
+from design import ORGANIZER_DEFAULTS, OrganizerDesign
+
+
+# Parameters a batch row can set and the type each one is read as.
+# Every parameter is optional and falls back to the default of
+# build_desk_organizer (or of the SVG canvas for svg_width/svg_height).
+# Rows with a sheet_width and sheet_height are nested onto that sheet,
+# which is then also the default canvas size. Rows with plan_cuts set
+# to 1 are written in the cutting order planned by cutplan, and rows
+# with curves set to 1 write circles as SVG curves. Rows with a
+# precision write compact paths rounded to that many decimals (0 to
+# svgpath.MAX_PRECISION, see PARAMETER_LIMITS), and rows
+# with instances set to 1 write repeated parts once with <use>. Rows with
+# symbols set to 1 write the logo once as a <symbol>, and rows with
+# outline_text set to 1 write the base text as glyph outlines. Every
+# variant is validated before it is written unless validate is set to 0.
+PARAMETER_TYPES = {
+    'length': float,
+    'width': float,
+    'shelf_area': float,
+    'num_shelves': int,
+    'kerf': float,
+    'num_junctions': int,
+    'screw_length': float,
+    'nut_width': float,
+    'sheet_thickness': float,
+    'nut_thickness': float,
+    'base_area': float,
+    'slot_length': float,
+    'screw_diameter': float,
+    'logo_file': str,
+    'svg_width': float,
+    'svg_height': float,
+    'sheet_width': float,
+    'sheet_height': float,
+    'spacing': float,
+    'plan_cuts': int,
+    'curves': int,
+    'precision': int,
+    'instances': int,
+    'symbols': int,
+    'outline_text': int,
+    'validate': int,
+}
+
+
+# The (lowest, highest) values of the parameters that are limited
+PARAMETER_LIMITS = {
+    'precision': (0, svgpath.MAX_PRECISION),
+}
+
+
+# Convert a raw value from the parameter table to the type of the
+# parameter. Whole numbers are kept as ints so they render the same
+# way as the interactive script, and so 500, 500.0 and "5e2" are the
+# same value. Values that are not a string or a number, such as JSON
+# lists or booleans, and numbers that are not finite raise ValueError
+# like malformed numbers.
+def parse_value(name, value):
+    kind = PARAMETER_TYPES.get(name)
+    if kind is None:
+        raise ValueError(f"Unknown parameter: {name}")
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise ValueError(f"{name} must be a {'string' if kind is str else 'number'}")
+    if kind is str:
+        return None if value == "" else str(value)
+    if isinstance(value, str):
+        value = value.strip()
+        if value == "":
+            return None
+        value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f"{name} must be a finite number")
+    if kind is int and not float(value).is_integer():
+        raise ValueError(f"{name} must be a whole number")
+    value = int(value) if float(value).is_integer() else float(value)
+    limits = PARAMETER_LIMITS.get(name)
+    if limits is not None and not limits[0] <= value <= limits[1]:
+        raise ValueError(f"{name} must be from {limits[0]} to {limits[1]}")
+    return value
+
+
+# Read a parameter table from a CSV file or a JSON lines file and
+# return a list of (job_id, parameters) tuples. A 'name' column or key
+# sets the job id, otherwise the rows are numbered.
+def read_parameters(path):
+    with open(path, newline='') as file:
+        if path.endswith('.csv'):
+            rows = list(csv.DictReader(file))
+        else:
+            rows = [json.loads(line) for line in file if line.strip()]
+    jobs = []
+    for i, row in enumerate(rows):
+        row = dict(row)
+        job_id = str(row.pop('name', None) or f"variant_{i + 1:05d}")
+        jobs.append((job_id, row))
+    return jobs
+
+
+# Each worker process keeps one design graph, so the rows a worker runs
+# reuse the parts that earlier rows built with the same dimensions
+_design = None
+
+
+# Parse a row of the parameter table, leaving out empty values
+def parse_row(row):
+    params = {}
+    for name, value in row.items():
+        value = parse_value(name, value)
+        if value is not None:
+            params[name] = value
+    return params
+
+
+# Count outline problems by kind
+def _count_problems(problems):
+    counts = {}
+    for problem in problems:
+        counts[problem.kind] = counts.get(problem.kind, 0) + 1
+    return counts
+
+
+# Build one organizer variant from parsed parameters. Returns the parts
+# to write and the keyword arguments for write_svg_document, and adds
+# the outline problems, cut plan and sheet usage to record. Outlines
+# that cross themselves or are turned inside out raise an OutlineError,
+# with every problem listed in record.
+def prepare_variant(params, record):
+    params = dict(params)
+    options = {
+        'width': params.pop('svg_width', params.get('sheet_width', 500)),
+        'height': params.pop('svg_height', params.get('sheet_height', 500)),
+        'curves': bool(params.pop('curves', 0)),
+        'precision': params.pop('precision', None),
+        'instances': bool(params.pop('instances', 0)),
+        'symbols': bool(params.pop('symbols', 0)),
+    }
+    plan_cuts = params.pop('plan_cuts', 0)
+    check = params.pop('validate', 1)
+    params.setdefault('logo_file', None)
+    global _design
+    if _design is None:
+        _design = OrganizerDesign()
+    try:
+        # Parts compensated for kerf have had their nominal outlines
+        # checked before they were offset, so only parts built without
+        # kerf are checked here
+        parts = _design.build(**params)
+        cut_parts = [p for p in parts if not isinstance(p, str)]
+        if check and not params.get('kerf', ORGANIZER_DEFAULTS['kerf']):
+            record['outline_problems'] = _count_problems(validate.check_parts(cut_parts))
+    except validate.OutlineError as e:
+        problems = e.problems or [e]
+        record['outline_problems'] = _count_problems(problems)
+        record['outline_errors'] = [problem.report() for problem in problems if problem.kind in validate.BLOCKING]
+        raise
+    document = parts
+    if plan_cuts:
+        plan = cutplan.plan_cuts(cut_parts)
+        document = [p for p in parts if isinstance(p, str)] + [plan]
+        record['cut_plan'] = plan.report()
+    record['usage'] = nesting.sheet_usage(cut_parts, options['width'], options['height'])
+    return document, options
+
+
+# Build one organizer variant and write it to out_dir/<job_id>.svg.
+# Runs in a worker process and never raises: failures are returned
+# in the job record so one bad row does not stop the batch. While
+# profiling is on, the job is profiled and the report is written to
+# out_dir/<job_id>.profile.json.
+def run_job(job):
+    job_id, row, out_dir = job
+    if not profiling.enabled():
+        return _run_job(job_id, row, out_dir)
+    with profiling.profile() as profile:
+        record = _run_job(job_id, row, out_dir)
+    report = profile.report()
+    output = os.path.join(out_dir, job_id + '.profile.json')
+    with open(output, 'w') as file:
+        json.dump(report, file, indent=2)
+    record['profile'] = output
+    record['phase_seconds'] = {phase: totals['seconds'] for phase, totals in report['phases'].items()}
+    return record
+
+
+def _run_job(job_id, row, out_dir):
+    record = {'id': job_id, 'parameters': row, 'status': 'ok', 'output': None, 'error': None}
+    start = time.perf_counter()
+    try:
+        document, options = prepare_variant(parse_row(row), record)
+        output = os.path.join(out_dir, job_id + '.svg')
+        with open(output, 'w') as file:
+            write_svg_document(file, document, **options)
+        record['output'] = output
+    except Exception as e:
+        record['status'] = 'failed'
+        record['error'] = f"{type(e).__name__}: {e}"
+        record['traceback'] = traceback.format_exc()
+    record['seconds'] = time.perf_counter() - start
+    return record
+
+
+# Run every job over a process pool and write a manifest with the
+# per-job timing and failures to out_dir/manifest.json. With profile set
+# every job is profiled (see run_job) and the manifest has the seconds
+# of every phase summed over the jobs.
+def run_batch(jobs, out_dir, workers=None, profile=False):
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    tasks = [(job_id, row, out_dir) for job_id, row in jobs]
+    # Hand each worker several jobs at a time so the pool overhead
+    # stays small next to the geometry work when there are many rows
+    chunksize = max(1, len(tasks) // (workers * 4))
+    if profile:
+        # Workers started after this inherit the setting
+        os.environ[profiling.ENVIRONMENT_VARIABLE] = '1'
+        profiling.enable()
+    start = time.perf_counter()
+    if workers == 1:
+        records = [run_job(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            records = list(executor.map(run_job, tasks, chunksize=chunksize))
+    wall_seconds = time.perf_counter() - start
+    failed = [r for r in records if r['status'] != 'ok']
+    manifest = {
+        'jobs': records,
+        'total': len(records),
+        'succeeded': len(records) - len(failed),
+        'failed': len(failed),
+        'workers': workers,
+        'wall_seconds': wall_seconds,
+        'job_seconds': sum(r['seconds'] for r in records),
+    }
+    if profiling.enabled():
+        phases = {}
+        for record in records:
+            for phase, seconds in record.get('phase_seconds', {}).items():
+                phases[phase] = phases.get(phase, 0.0) + seconds
+        manifest['phase_seconds'] = phases
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as file:
+        json.dump(manifest, file, indent=2)
+    return manifest
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate one desk organizer SVG per row of a parameter table.")
+    parser.add_argument('parameters', help="CSV file with a header row, or JSON lines file with one object per line")
+    parser.add_argument('-o', '--out-dir', default='batch_output', help="directory for the SVG files and manifest.json")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="number of worker processes (default: CPU count)")
+    parser.add_argument('--profile', action='store_true',
+                        help=f"write a profile of every job to <name>.profile.json (or set {profiling.ENVIRONMENT_VARIABLE}=1)")
+    args = parser.parse_args()
+
+    manifest = run_batch(read_parameters(args.parameters), args.out_dir, args.workers, args.profile)
+    print(f"{manifest['succeeded']}/{manifest['total']} variants written to {args.out_dir} "
+          f"in {manifest['wall_seconds']:.2f}s using {manifest['workers']} workers")
+    for record in manifest['jobs']:
+        if record['status'] != 'ok':
+            print(f"  {record['id']}: {record['error']}")
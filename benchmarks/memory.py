@@ -0,0 +1,87 @@
+import argparse
+import gc
+import os
+import resource
+import sys
+import time
+
+# Build many small components in repeated jobs, the way a long-running
+# batch process does, and check that the memory used by a job is given
+# back when it is done. Exits with a non-zero status when the RSS keeps
+# growing from job to job or a component takes more memory than budgeted.
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from component import Component, Shape
+
+
+# Get the resident set size of the process in MB
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        # Peak RSS only, in KB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+# Build num_components components, each with a rectangular mother shape
+# and a hole, without giving any lists to the constructor
+def build(num_components):
+    components = []
+    for i in range(num_components):
+        x = (i % 100) * 20.0
+        y = (i // 100) * 20.0
+        mother = Shape()
+        mother.set_points(mother.generate_rectangle(10, 10, 0, (x, y)))
+        hole = Shape()
+        hole.set_points(hole.generate_rectangle(2, 2, 0, (x + 4, y + 4)))
+        component = Component('part')
+        component.add_shape(mother, (x + 5, y + 5), True)
+        component.add_shape(hole, (x + 5, y + 5))
+        components.append(component)
+    return components
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Memory use of repeated component builds.")
+    parser.add_argument('--components', type=int, default=100000, help="components built per job")
+    parser.add_argument('--jobs', type=int, default=5)
+    parser.add_argument('--max-growth-mb', type=float, default=5.0,
+                        help="budget for the RSS growth between the first and the last job")
+    parser.add_argument('--max-kb-per-component', type=float, default=3.0,
+                        help="budget for the memory a live component with two shapes takes")
+    args = parser.parse_args()
+
+    failures = []
+    after_jobs = []
+    for job in range(args.jobs):
+        gc.collect()
+        before = rss_mb()
+        start = time.perf_counter()
+        components = build(args.components)
+        seconds = time.perf_counter() - start
+        live = rss_mb()
+        # Every component must own its lists; a shared default would put
+        # every hole of the job into each component
+        shared = sum(len(component.data['shapes']) != 1 for component in components)
+        if shared:
+            failures.append(f"job {job + 1}: {shared} components share their shape lists")
+        del components
+        gc.collect()
+        after_jobs.append(rss_mb())
+        per_component = (live - before) * 1024 / args.components
+        print(f"job {job + 1}: built {args.components} components in {seconds:.2f}s, "
+              f"{live - before:.1f} MB live ({per_component:.2f} KB per component), "
+              f"RSS after job {after_jobs[-1]:.1f} MB")
+        if job == 0 and per_component > args.max_kb_per_component:
+            failures.append(f"{per_component:.2f} KB per component exceeds {args.max_kb_per_component:.2f} KB")
+
+    growth = after_jobs[-1] - after_jobs[0]
+    print(f"RSS growth from job 1 to job {args.jobs}: {growth:.1f} MB")
+    if growth > args.max_growth_mb:
+        failures.append(f"RSS grew by {growth:.1f} MB over {args.jobs} jobs, budget {args.max_growth_mb:.1f} MB")
+    for failure in failures:
+        print("REGRESSION: " + failure)
+    sys.exit(1 if failures else 0)
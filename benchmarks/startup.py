@@ -0,0 +1,67 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Measure the cold import cost of the geometry modules: every sample
+# is a fresh interpreter, so nothing is cached between runs. Exits with
+# a non-zero status when a budget is exceeded or a heavy module that
+# should be loaded lazily shows up at import time.
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be imported just by importing the package
+FORBIDDEN_MODULES = ['matplotlib', 'matplotlib.font_manager', 'numpy']
+
+PROBE = '''
+import json, resource, sys, time
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{
+    "import_ms": seconds * 1000,
+    "rss_kb": after,
+    "import_rss_kb": after - before,
+    "modules": sorted(sys.modules),
+}}))
+'''
+
+
+# Import the module in a fresh interpreter and return the measurements
+def sample(module):
+    output = subprocess.run([sys.executable, '-c', PROBE.format(module=module)],
+                            cwd=REPO, check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Cold import time and memory benchmark.")
+    parser.add_argument('--module', default='component')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--max-import-ms', type=float, default=250.0, help="budget for the median import time")
+    parser.add_argument('--max-rss-mb', type=float, default=60.0, help="budget for the peak RSS after import")
+    args = parser.parse_args()
+
+    samples = [sample(args.module) for _ in range(args.runs)]
+    import_ms = statistics.median(s['import_ms'] for s in samples)
+    rss_mb = max(s['rss_kb'] for s in samples) / 1024
+    import_rss_mb = statistics.median(s['import_rss_kb'] for s in samples) / 1024
+    print(f"import {args.module}: median {import_ms:.1f} ms over {args.runs} runs, "
+          f"peak RSS {rss_mb:.1f} MB ({import_rss_mb:.1f} MB added by the import)")
+
+    failures = []
+    loaded = set(samples[0]['modules'])
+    for module in FORBIDDEN_MODULES:
+        if module in loaded:
+            failures.append(f"{module} is imported at startup")
+    if import_ms > args.max_import_ms:
+        failures.append(f"median import time {import_ms:.1f} ms exceeds {args.max_import_ms:.1f} ms")
+    if rss_mb > args.max_rss_mb:
+        failures.append(f"peak RSS {rss_mb:.1f} MB exceeds {args.max_rss_mb:.1f} MB")
+    for failure in failures:
+        print("REGRESSION: " + failure)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,243 @@
+import argparse
+import gc
+import io
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+# Time the geometry, junction generation and SVG export on synthetic
+# workloads: shapes of 10^3 to 10^6 points, a sheet with hundreds of
+# junction holes, a deep tree of nested components and the full build of
+# the interactive script. Every benchmark reports the latency percentiles
+# of its runs, its throughput and the peak memory traced during one run.
+# With --save the results are written as a baseline; with --baseline
+# they are compared with one, and the script exits with a non-zero
+# status when a benchmark got slower or takes more memory than allowed.
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import component
+from component import Component, Shape, build_desk_organizer, write_svg_document
+
+# Hardware of the junctions, as in build_desk_organizer
+HARDWARE = (8.5, 4.5, 3, 1.5, 5, 2.1)
+
+# Allocations below this many KB are noise, not a memory regression
+MEMORY_SLACK_KB = 64
+
+
+# Get the points of a circle with num_points points
+def circle_points(num_points, radius=1000.0):
+    step = 2 * math.pi / num_points
+    return [(radius * math.cos(i * step), radius * math.sin(i * step)) for i in range(num_points)]
+
+
+# Rotate a shape of num_points points, held in a list or in an array
+def shape_rotate(num_points, array_backed=False):
+    shape = Shape(circle_points(num_points), array_backed=array_backed)
+    return lambda: shape.rotate(1.0, (0, 0))
+
+
+# Generate a side with num_junctions captive joints, with the compiled
+# side templates cached or cleared before every run
+def junction_side(num_junctions, cached=True):
+    def run():
+        if not cached:
+            component.compile_side.cache_clear()
+            component.compile_junction.cache_clear()
+        return Shape().generate_side_with_complex_junction((0, 0), 40 * num_junctions, 0, 'captive joint slot',
+                                                           num_junctions, *HARDWARE)
+    return run
+
+
+# Build a sheet with num_holes junction holes in a grid; every hole is
+# checked against the sheet outline and the holes already added. With
+# array_backed the sheet outline is an array and the index is built
+# before the first hole, so its cells are sized from the sheet.
+def build_junction_sheet(num_holes, array_backed=False):
+    columns = math.ceil(math.sqrt(num_holes * 3))
+    rows = math.ceil(num_holes / columns)
+    sheet = Component('sheet')
+    mother = Shape(array_backed=array_backed)
+    mother.set_points(mother.generate_rectangle(columns * 40 + 20, rows * 15 + 20, 0, (0, 0)))
+    sheet.add_shape(mother, (0, 0), True)
+    if array_backed:
+        sheet.get_index()
+    for i in range(num_holes):
+        sheet.generate_junction_holes((10 + (i % columns) * 40, 10 + (i // columns) * 15), 0, *HARDWARE)
+    return sheet
+
+
+# Build a binary tree of components depth levels deep: every component
+# holds two children side by side
+def build_tree(depth, width=4096.0, height=64.0, origin=(0.0, 0.0)):
+    node = Component('node')
+    mother = Shape()
+    mother.set_points(mother.generate_rectangle(width, height, 0, origin))
+    node.add_shape(mother, origin, True)
+    if depth > 1:
+        half = width / 2
+        for i in range(2):
+            child = build_tree(depth - 1, half - 4, height - 4, (origin[0] + i * half + 2, origin[1] + 2))
+            node.add_component(child, child.get_center())
+    return node
+
+
+# Rotate a tree of components and write it as SVG, which places every
+# child through the transforms of its parents
+def tree_export(tree):
+    def run():
+        tree.rotate(1.0)
+        return tree.to_svg()
+    return run
+
+
+# Build the organizer and write the document, like the interactive script
+def organizer(logo_file=None):
+    def run():
+        parts = build_desk_organizer(100, 50, 175, 2, sheet_width=500, sheet_height=500, logo_file=logo_file)
+        write_svg_document(io.StringIO(), parts, 500, 500, 1)
+    return run
+
+
+# Count the points in the outlines of a component and its children
+def count_points(part):
+    return len(part.get_mother_shape(local=True).points) + sum(len(shape.points) for shape in part.shapes) + \
+        sum(count_points(child) for child in part.components)
+
+
+# Get the benchmarks as (name, make, items, unit); make returns the
+# function that is timed, items is the work one call does
+def benchmarks(args):
+    found = []
+    for size in args.sizes:
+        found.append((f'shape_rotate_list_{size}', lambda size=size: shape_rotate(size), size, 'points'))
+        if component._numpy() is not None:
+            found.append((f'shape_rotate_array_{size}', lambda size=size: shape_rotate(size, True), size, 'points'))
+    side_points = len(junction_side(args.junctions)())
+    found.append((f'junction_side_{args.junctions}', lambda: junction_side(args.junctions), side_points, 'points'))
+    found.append((f'junction_side_cold_{args.junctions}', lambda: junction_side(args.junctions, False), side_points,
+                  'points'))
+    found.append((f'junction_sheet_{args.holes}', lambda: lambda: build_junction_sheet(args.holes), args.holes, 'holes'))
+    if component._numpy() is not None:
+        found.append((f'junction_sheet_array_{args.holes}', lambda: lambda: build_junction_sheet(args.holes, True),
+                      args.holes, 'holes'))
+    sheet = build_junction_sheet(args.holes)
+    found.append((f'svg_sheet_{args.holes}', lambda: sheet.to_svg, count_points(sheet), 'points'))
+    nodes = 2 ** args.depth - 1
+    found.append((f'tree_build_{args.depth}', lambda: lambda: build_tree(args.depth), nodes, 'components'))
+    found.append((f'tree_rotate_svg_{args.depth}', lambda: tree_export(build_tree(args.depth)), nodes, 'components'))
+    found.append(('organizer', lambda: organizer(args.logo), 1, 'organizers'))
+    return [benchmark for benchmark in found if not args.only or any(name in benchmark[0] for name in args.only)]
+
+
+# Get a percentile of sorted samples, interpolating between neighbours
+def percentile(samples, fraction):
+    position = (len(samples) - 1) * fraction
+    low = math.floor(position)
+    high = min(low + 1, len(samples) - 1)
+    return samples[low] + (samples[high] - samples[low]) * (position - low)
+
+
+# Time a function: at least min_runs runs and at least min_seconds in
+# total, at most max_runs. Returns the timings and the peak memory of
+# one more run under tracemalloc.
+def measure(run, items, unit, min_runs, min_seconds, max_runs):
+    run()
+    samples = []
+    total = 0.0
+    while len(samples) < max_runs and (len(samples) < min_runs or total < min_seconds):
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        seconds = time.perf_counter() - start
+        samples.append(seconds)
+        total += seconds
+    gc.collect()
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    samples.sort()
+    median = statistics.median(samples)
+    return {
+        'runs': len(samples),
+        'min_ms': samples[0] * 1000,
+        'median_ms': median * 1000,
+        'p90_ms': percentile(samples, 0.9) * 1000,
+        'p99_ms': percentile(samples, 0.99) * 1000,
+        'max_ms': samples[-1] * 1000,
+        'items': items,
+        'unit': unit,
+        'throughput': items / median if median > 0 else float('inf'),
+        'peak_kb': peak / 1024,
+    }
+
+
+# Compare results with a baseline and return the regressions as messages.
+# A benchmark regresses when its median is more than tolerance slower, or
+# its peak memory more than memory_tolerance larger, than in the baseline.
+def compare(results, baseline, tolerance, memory_tolerance):
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"  {name}: not in the baseline")
+            continue
+        ratio = result['median_ms'] / base['median_ms'] if base['median_ms'] > 0 else 1.0
+        print(f"  {name}: median {ratio:.2f}x the baseline, peak {result['peak_kb']:.0f} KB "
+              f"(baseline {base['peak_kb']:.0f} KB)")
+        if ratio > 1 + tolerance:
+            regressions.append(f"{name}: median {result['median_ms']:.3f} ms is {ratio:.2f}x the baseline "
+                               f"{base['median_ms']:.3f} ms")
+        if result['peak_kb'] > base['peak_kb'] * (1 + memory_tolerance) + MEMORY_SLACK_KB:
+            regressions.append(f"{name}: peak memory {result['peak_kb']:.0f} KB exceeds the baseline "
+                               f"{base['peak_kb']:.0f} KB")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Geometry, junction and SVG export benchmarks.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6],
+                        help="point counts of the shape benchmarks")
+    parser.add_argument('--junctions', type=int, default=100, help="junctions on the generated side")
+    parser.add_argument('--holes', type=int, default=300, help="junction holes on the sheet")
+    parser.add_argument('--depth', type=int, default=8, help="levels of the component tree")
+    parser.add_argument('--logo', default=None, help="logo file for the organizer build")
+    parser.add_argument('--only', nargs='+', default=None, help="run the benchmarks whose names contain these")
+    parser.add_argument('--min-runs', type=int, default=5)
+    parser.add_argument('--min-seconds', type=float, default=0.5, help="minimum total time of the runs of a benchmark")
+    parser.add_argument('--max-runs', type=int, default=1000)
+    parser.add_argument('--save', default=None, help="write the results as a baseline to this file")
+    parser.add_argument('--baseline', default=None, help="compare with the baseline in this file")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown of the median")
+    parser.add_argument('--memory-tolerance', type=float, default=0.25, help="allowed growth of the peak memory")
+    args = parser.parse_args()
+
+    results = {}
+    for name, make, items, unit in benchmarks(args):
+        result = results[name] = measure(make(), items, unit, args.min_runs, args.min_seconds, args.max_runs)
+        print(f"{name}: median {result['median_ms']:.3f} ms, p90 {result['p90_ms']:.3f} ms, "
+              f"p99 {result['p99_ms']:.3f} ms over {result['runs']} runs, "
+              f"{result['throughput']:,.0f} {unit}/s, peak {result['peak_kb']:.0f} KB")
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(), 'benchmarks': results},
+                      file, indent=2)
+        print(f"Baseline written to {args.save}")
+
+    failures = []
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        print(f"Compared with {args.baseline} (Python {baseline.get('python')}):")
+        failures = compare(results, baseline['benchmarks'], args.tolerance, args.memory_tolerance)
+    for failure in failures:
+        print("REGRESSION: " + failure)
+    sys.exit(1 if failures else 0)
@@ -1,27 +1,133 @@
+import functools
+import itertools
 import math
 import random
-import matplotlib.font_manager as fm
+
+import assets
+import fonts
+import geometry
+import nesting
+import svgpath
+import validate
+
+# numpy is optional, it is only needed for array-backed shapes and for
+# paths long enough to vectorize. It is imported the first time one of
+# them needs it (see _numpy), and np stays None until then.
+np = None
+
+
+# Return numpy, importing it on first use, or None when it is not
+# installed. Array-backed shapes import it when they are created, so
+# their methods can use np directly.
+def _numpy():
+    global np
+    if np is None:
+        np = geometry.get_numpy()
+    return np
+
+
+# Version stamps of shapes, see Shape.version
+_versions = itertools.count()
 
 
 # The Shape class represents a basic shape in a 2D plane.
 # It contains the points that make up the shape, as well
 # as its center x and y coordinates.
 class Shape:
-    # Initialize Shape class with points
-    def __init__(self, points=None):
-        if points:
+    # Shapes are created by the thousand, so they keep their state in
+    # slots instead of a per-instance dictionary
+    __slots__ = ('array_backed', 'points', 'bounding_box', 'center', 'area', 'circle', 'junction_points', 'version')
+
+    # Number of derived geometry lookups answered from / missing the
+    # per-shape cache, summed over every shape in the process
+    cache_hits = 0
+    cache_misses = 0
+
+    # Initialize Shape class with points. When array_backed is True
+    # the points are held as an Nx2 float64 numpy array and the
+    # transforms and measurements run as vectorized calls.
+    def __init__(self, points=None, array_backed=False):
+        if array_backed and _numpy() is None:
+            raise ImportError("numpy is required for array-backed shapes")
+        self.array_backed = array_backed
+        self.points = []
+        # A stamp, unique in the process, that changes whenever the points
+        # do, so copies placed from the shape can tell they are stale
+        self.version = next(_versions)
+        # Derived values, computed on the first lookup
+        self.bounding_box = None
+        self.center = None
+        self.area = None
+        # ((x, y), radius) when the points trace a circle, kept through
+        # translate and rotate so the circle can be written as a curve
+        self.circle = None
+        if points is not None and len(points):
             self.set_points(points)
-        self.junction_points = []
+        self.junction_points = None
+
+    # Return the cache hit/miss counters as a dictionary
+    @classmethod
+    def cache_stats(cls):
+        total = cls.cache_hits + cls.cache_misses
+        return {
+            'hits': cls.cache_hits,
+            'misses': cls.cache_misses,
+            'hit_rate': cls.cache_hits / total if total else 0.0
+        }
 
-    # Get the points of the shape
+    # Reset the cache hit/miss counters
+    @classmethod
+    def reset_cache_stats(cls):
+        cls.cache_hits = 0
+        cls.cache_misses = 0
+
+    # Drop the cached centroid, bounding box and area. set_points does
+    # this automatically, call it after mutating get_points() in place.
+    def invalidate_cache(self):
+        self.version = next(_versions)
+        self.bounding_box = None
+        self.center = None
+        self.area = None
+
+    # Look up a derived value in its slot, computing it on a miss
+    def __cached(self, key, compute):
+        value = getattr(self, key)
+        if value is not None:
+            Shape.cache_hits += 1
+            return value
+        Shape.cache_misses += 1
+        value = compute()
+        setattr(self, key, value)
+        return value
+
+    # Get the points of the shape as a list of (x, y) tuples
     def get_points(self):
         points = self.points
-        if not points:
+        if len(points) == 0:
             raise ValueError("Error: No points have been set for this component")
+        if self.array_backed:
+            return list(map(tuple, points.tolist()))
         return points
 
+    # Get the points of the shape as an Nx2 numpy array
+    def get_array(self):
+        if _numpy() is None:
+            raise ImportError("numpy is required for array-backed shapes")
+        if self.array_backed:
+            if len(self.points) == 0:
+                raise ValueError("Error: No points have been set for this component")
+            return self.points
+        return np.array(self.get_points(), dtype=np.float64)
+
     # Get the bounding box of the shape
     def get_bounding_box(self):
+        return self.__cached('bounding_box', self.__compute_bounding_box)
+
+    def __compute_bounding_box(self):
+        if self.array_backed:
+            min_x, min_y = self.get_array().min(axis=0).tolist()
+            max_x, max_y = self.get_array().max(axis=0).tolist()
+            return (min_x, min_y, max_x, max_y)
         x_values = [point[0] for point in self.get_points()]
         y_values = [point[1] for point in self.get_points()]
         min_x = min(x_values)
@@ -32,37 +138,52 @@ class Shape:
 
     # Get the x point of the shape (center)
     def get_x(self):
-        points = self.get_points()
-        l = len(points)
-        return sum(p[0] for p in self.get_points()) / l
+        return self.get_center()[0]
 
     # Get the y point of the shape (center)
     def get_y(self):
-        points = self.get_points()
-        l = len(points)
-        return sum(p[1] for p in self.get_points()) / l
+        return self.get_center()[1]
 
     # Get the center of the shape as an x,y tuple
     def get_center(self):
-        return (self.get_x(), self.get_y())
+        return self.__cached('center', self.__compute_center)
+
+    def __compute_center(self):
+        if self.array_backed:
+            x, y = self.get_array().mean(axis=0).tolist()
+            return (x, y)
+        points = self.get_points()
+        l = len(points)
+        return (sum(p[0] for p in points) / l, sum(p[1] for p in points) / l)
 
     # Get the width of the shape
     def get_width(self):
-        return max(p[0] for p in self.get_points()) - min(p[0] for p in self.get_points())
+        min_x, _, max_x, _ = self.get_bounding_box()
+        return max_x - min_x
 
     # Get the length of the shape
     def get_length(self):
-        return max(p[1] for p in self.get_points()) - min(p[1] for p in self.get_points())
+        _, min_y, _, max_y = self.get_bounding_box()
+        return max_y - min_y
     
     # return a list where each item is list of points for a junction
     def get_junction_points(self):
+        if self.junction_points is None:
+            self.junction_points = []
         return self.junction_points
     
     def store_junction_points(self, points:list):
-        self.junction_points.append(points)
+        self.get_junction_points().append(points)
 
     # Get the area of the shape
     def get_area(self) -> float:
+        return self.__cached('area', self.__compute_area)
+
+    def __compute_area(self):
+        if self.array_backed:
+            x = self.points[:, 0]
+            y = self.points[:, 1]
+            return abs(float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y))) / 2.0
         n = len(self.points)
         area = 0.0
         for i in range(n):
@@ -72,180 +193,534 @@ class Shape:
         area = abs(area) / 2.0
         return area
 
-    # Set the points of the shape
+    # Set the points of the shape. Array-backed shapes also accept
+    # an Nx2 numpy array, which is stored without copying.
     def set_points(self, points):
+        if self.array_backed:
+            if isinstance(points, np.ndarray):
+                if points.ndim != 2 or points.shape[1] != 2:
+                    raise ValueError("points must be an Nx2 array")
+                self.points = points.astype(np.float64, copy=False)
+                self.invalidate_cache()
+                self.circle = None
+                return
         if type(points) != list or not all(isinstance(p, tuple) and len(p) == 2 for p in points):
             raise ValueError("points must be a list of (x, y) tuples")
-        self.points = points
+        if self.array_backed:
+            self.points = np.array(points, dtype=np.float64).reshape(-1, 2)
+        else:
+            self.points = points
+        self.invalidate_cache()
+        self.circle = None
 
     # Move the shape to the specified x and y location
     def move_to(self, x, y):
-        offset_x = x - self.get_x()
-        offset_y = y - self.get_y()
-        self.set_points([(x_ + offset_x, y_ + offset_y) for x_, y_ in self.get_points()])
+        self.translate(x - self.get_x(), y - self.get_y())
+
+    # Move every point of the shape by the given offset
+    def translate(self, offset_x, offset_y):
+        circle = self.circle
+        if self.array_backed:
+            self.set_points(self.get_array() + (offset_x, offset_y))
+        else:
+            self.set_points([(x_ + offset_x, y_ + offset_y) for x_, y_ in self.get_points()])
+        if circle is not None:
+            (x, y), radius = circle
+            self.circle = ((x + offset_x, y + offset_y), radius)
 
     # Calculate the new point based on the given point, length, and angle
     def calculate_new_point(self, point, length, angle):
         x, y = point
-        new_x = x + length * math.cos(math.radians(angle))
-        new_y = y + length * math.sin(math.radians(angle))
+        cos_a, sin_a = heading_vector(angle)
+        new_x = x + length * cos_a
+        new_y = y + length * sin_a
         return (new_x, new_y)
 
     # rotate all the points in the shape by the given angle
-    # around the center point of the shape.
-    def rotate(self, angle):
-        origin_x, origin_y = self.get_x(), self.get_y()
-        self.set_points([self.rotate_point(point, origin_x, origin_y, angle) for point in self.get_points()])
+    # around the center point of the shape, or around origin if given.
+    def rotate(self, angle, origin=None):
+        origin_x, origin_y = origin if origin is not None else self.get_center()
+        cos_a = math.cos(math.radians(angle))
+        sin_a = math.sin(math.radians(angle))
+        circle = self.circle
+        if self.array_backed:
+            dx = self.points[:, 0] - origin_x
+            dy = self.points[:, 1] - origin_y
+            self.set_points(np.column_stack((dx * cos_a - dy * sin_a + origin_x,
+                                             dx * sin_a + dy * cos_a + origin_y)))
+        else:
+            self.set_points([self.__rotate_point(point, origin_x, origin_y, cos_a, sin_a) for point in self.get_points()])
+        if circle is not None:
+            center, radius = circle
+            self.circle = (self.__rotate_point(center, origin_x, origin_y, cos_a, sin_a), radius)
+
+    # Get a copy of the shape with an affine transform (see geometry) applied
+    def transformed(self, matrix):
+        shape = Shape(array_backed=self.array_backed)
+        shape.set_points(geometry.transform_points(matrix, self.points))
+        if self.circle is not None:
+            shape.circle = (geometry.transform_point(matrix, self.circle[0]), self.circle[1])
+        return shape
+
+    # Apply an affine transform (see geometry) to the points of the shape
+    def apply_transform(self, matrix):
+        circle = self.circle
+        self.set_points(geometry.transform_points(matrix, self.points))
+        if circle is not None:
+            self.circle = (geometry.transform_point(matrix, circle[0]), circle[1])
+
+    # Offset the outline of the shape by a distance: outward when it is
+    # positive, inward when it is negative (see geometry.offset_polygons)
+    def offset(self, distance, miter_limit=geometry.MITER_LIMIT):
+        offset_shapes([self], [distance], miter_limit)
 
     # rotate a single point using the given rotation matrix
     def rotate_point(self, point, origin_x, origin_y, angle):
+        return self.__rotate_point(point, origin_x, origin_y, math.cos(math.radians(angle)), math.sin(math.radians(angle)))
+
+    # rotate a single point with a precomputed cosine and sine
+    def __rotate_point(self, point, origin_x, origin_y, cos_a, sin_a):
         x, y = point
-        new_x = (x - origin_x) * math.cos(math.radians(angle)) - (y - origin_y) * math.sin(math.radians(angle)) + origin_x
-        new_y = (x - origin_x) * math.sin(math.radians(angle)) + (y - origin_y) * math.cos(math.radians(angle)) + origin_y
+        new_x = (x - origin_x) * cos_a - (y - origin_y) * sin_a + origin_x
+        new_y = (x - origin_x) * sin_a + (y - origin_y) * cos_a + origin_y
         return (new_x, new_y)
 
-    # generate complex junction as a list of points
+    # generate complex junction as a list of points. The outline comes
+    # from the compiled template for the junction and hardware spec, so
+    # only the translation to the point is done per call.
     def complex_junction(self, point, direction, junction_name: str, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter):
-        new_points = [point]
-        # parameters that will change depending on the type
-        # of screw, nut and thickness of the sheet being cut
-        a = sheet_thickness
-        b = slot_length
-        e = nut_thickness
-        f = nut_width
-        d = screw_length - a - e
-        g = screw_diameter
-        c = (f - g) / 2
-        c1 = 6*c
-        c2 = c1 + (f - 2*c) + c1
-
-        junction_types = {
-            'captive joint slot':[[-90, 0, 90, 0, 90, 180, 90, 0, -90, 180, -90, 0, -90, 0, 90],
-                                    [a, b, a, c1, d, c, e, f, e, c, d, c1, a, b, a]],
-            'captive joint base':[[90, 0, -90, 0, 90, 0, -90], [a, b, a, c2, a, b, a]],
-            'plain slot':[[-90, 0, 90, 0, -90, 0, 90], [a, b, a, c2, a, b, a]]
-        }
-
-        angles = junction_types[junction_name][0]
-        distances = junction_types[junction_name][1]
-        for i in range(len(angles)):
-            new_angle = (direction + angles[i] + 360) % 360
-            new_points.append(self.calculate_new_point(new_points[-1], distances[i], new_angle))
+        x, y = point
+        offsets = compile_junction(junction_name, direction, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter)
+        new_points = [point] + [(x + dx, y + dy) for dx, dy in offsets]
         c = new_points.copy()
         self.store_junction_points(c)
         return new_points
 
-    # generate side with desired number of junctions as a list of points
+    # generate side with desired number of junctions as a list of points.
+    # The whole side is compiled once per length, direction, junction and
+    # hardware spec and then stamped onto the starting point.
     def generate_side_with_complex_junction(self, point, length, direction, junction_name, num_junctions, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter):
-        # parameters that will change depending on the type
-        # of screw, nut and thickness of the sheet being cut
-        a = sheet_thickness
-        b = slot_length
-        e = nut_thickness
-        f = nut_width
-        d = screw_length - a - e
-        g = screw_diameter
-        c = (f - g) / 2
-        c1 = 6*c
-        c2 = c1 + (f - 2*c) + c1
-        if junction_name == 'captive joint slot':
-            junction_length =  b + c1 + g + c1 + b
-        else:
-            junction_length = b + c1 + g + c1 + b
-        remaining_length = (length - (junction_length * num_junctions)) / (num_junctions + 1)
-        new_points = []
-        for i in range(int(num_junctions)):
-            new_points.append(self.calculate_new_point(new_points[-1] if i > 0 else point, remaining_length, direction))
-            new_points.extend(self.complex_junction(new_points[-1], direction, junction_name, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter))
-            new_points.append(self.calculate_new_point(new_points[-1], remaining_length, direction))
+        x, y = point
+        offsets, junctions = compile_side(length, direction, junction_name, num_junctions, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter)
+        new_points = [(x + dx, y + dy) for dx, dy in offsets]
+        for start, end in junctions:
+            self.store_junction_points(new_points[start:end])
         return new_points
 
     # generate rectangular shelf with desired length, width, and total number of
     # junctions for the short sides as a list of points starting from input
     # point
     def generate_rectangle_shelf(self, length, width, junction_name, num_junctions, starting_point, direction, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter):
-        new_points = [starting_point]
+        spec = (screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter)
         half_captive_junctions = num_junctions / 2
+        path = PathBuilder(starting_point)
         new_angle = direction
-        new_points.extend(self.generate_side_with_complex_junction(new_points[-1], width, new_angle, junction_name, half_captive_junctions, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter))
+        path.extend_side(width, new_angle, junction_name, half_captive_junctions, *spec)
         new_angle = (new_angle + 90 + 360) % 360
-        new_points.append(self.calculate_new_point(new_points[-1], length, new_angle))
+        path.step(new_angle, length)
         new_angle = (new_angle + 90 + 360) % 360
-        new_points.extend(self.generate_side_with_complex_junction(new_points[-1], width, new_angle, junction_name, half_captive_junctions, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter))
+        path.extend_side(width, new_angle, junction_name, half_captive_junctions, *spec)
         new_angle = (new_angle + 90 + 360) % 360
-        new_points.append(self.calculate_new_point(new_points[-1], length, new_angle))
-        return new_points
+        path.step(new_angle, length)
+        return self.__build_path(path)
 
     def generate_rectangle_tower(self, length, width, junction_name, num_junctions, starting_point, direction, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter):
-        new_points = [starting_point]
+        spec = (screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter)
         half_captive_junctions = num_junctions / 2
+        path = PathBuilder(starting_point)
         new_angle = direction
-        new_points.extend(self.generate_side_with_complex_junction(new_points[-1], width, new_angle, junction_name, half_captive_junctions, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter))
+        path.extend_side(width, new_angle, junction_name, half_captive_junctions, *spec)
         new_angle = (new_angle + 90 + 360) % 360
-        new_points.append(self.calculate_new_point(new_points[-1], length, new_angle))
+        path.step(new_angle, length)
         new_angle = (new_angle + 90 + 360) % 360
-        new_points.append(self.calculate_new_point(new_points[-1], width, new_angle))
+        path.step(new_angle, width)
         new_angle = (new_angle + 90 + 360) % 360
-        new_points.append(self.calculate_new_point(new_points[-1], length, new_angle))
+        path.step(new_angle, length)
+        return self.__build_path(path)
+
+    # Trace a path and store the points of the junctions on it. Array
+    # backed shapes get the points, and store the junctions, as arrays.
+    def __build_path(self, path):
+        new_points = path.build(self.array_backed)
+        for start, end in path.junctions:
+            self.store_junction_points(new_points[start:end].copy() if self.array_backed else new_points[start:end])
         return new_points
 
-
     # generate polygon with the desired number of sides, of desired length
     # as a list of points starting from input point.
     def generate_polygon(self, num_sides, side_length, starting_point):
         angle = 360 / num_sides
-        new_points = [starting_point]
-        current_point = starting_point
-        for i in range(num_sides - 1):
-            current_point = self.calculate_new_point(current_point, side_length, angle * (i + 1))
-            new_points.append(current_point)
-        return new_points
+        vectorize = num_sides > VECTORIZE_THRESHOLD and _numpy() is not None
+        if not self.array_backed and not vectorize:
+            return trace_list(starting_point, [angle * (i + 1) for i in range(num_sides - 1)], [side_length] * (num_sides - 1))
+        path = PathBuilder(starting_point)
+        if vectorize:
+            path.extend(angle * np.arange(1, num_sides), np.full(num_sides - 1, side_length))
+        else:
+            path.extend([angle * (i + 1) for i in range(num_sides - 1)], [side_length] * (num_sides - 1))
+        return path.build(self.array_backed)
 
     # generate polygon with the desired number of sides, of desired length
-    # as a list of points starting from input point.
-    def generate_polygon_with_junctions(self, num_sides, junction_name, num_junctions, side_length, starting_point):
+    # as a list of points starting from input point. The last side carries
+    # the junctions for the given screw, nut and sheet parameters.
+    def generate_polygon_with_junctions(self, num_sides, junction_name, num_junctions, side_length, starting_point, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter):
         angle = 360 / num_sides
-        new_points = [starting_point]
-        current_point = starting_point
+        path = PathBuilder(starting_point)
         for i in range(num_sides - 2):
-            current_point = self.calculate_new_point(current_point, side_length, angle * (i + 1))
-            new_points.append(current_point)
-        new_points.extend(self.generate_side_with_complex_junction(new_points[-1], side_length, angle * (num_sides-1), junction_name, num_junctions, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter))
-        return new_points
+            path.step(angle * (i + 1), side_length)
+        path.extend_side(side_length, angle * (num_sides-1), junction_name, num_junctions, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter)
+        return self.__build_path(path)
 
     def generate_rectangle(self, length, width, direction, starting_point:tuple):
-        x, y = starting_point
-        new_angle = direction
-        new_points = [starting_point]
-        new_points.append(self.calculate_new_point(starting_point, length, new_angle))
-        new_angle = (new_angle + 90 + 360) % 360
-        new_points.append(self.calculate_new_point(new_points[-1], width, new_angle))
-        new_angle = (new_angle + 90 + 360) % 360
-        new_points.append(self.calculate_new_point(new_points[-1], length, new_angle))
+        second = (direction + 90 + 360) % 360
+        third = (second + 90 + 360) % 360
+        new_points = trace_list(starting_point, (direction, second, third), (length, width, length))
         new_points.append(starting_point)
+        if self.array_backed:
+            return np.array(new_points, dtype=np.float64)
         return new_points
 
-    # generate circle with the desired radius as a list of points starting 
-    # from the input point. Default number of points is 50, but can be set 
-    # to be coarser or finer
-    def generate_circle(self, radius, start_point, num_points=50):
+    # generate circle with the desired radius around the input point as a
+    # list of points, the first point repeated at the end. The number of
+    # points is chosen so no chord strays more than tolerance (default
+    # DEFAULT_CHORD_TOLERANCE) from the circle, unless num_points is set.
+    def generate_circle(self, radius, start_point, num_points=None, tolerance=None):
+        return self.generate_arc(radius, start_point, 0, 360, num_points, tolerance)
+
+    # generate an arc with the desired radius around the center as a list
+    # of points from start_angle to end_angle (in degrees, counterclockwise
+    # for end_angle > start_angle). The number of segments is chosen as in
+    # generate_circle.
+    def generate_arc(self, radius, center, start_angle, end_angle, num_points=None, tolerance=None):
+        if radius <= 0:
+            raise ValueError("Radius must be greater than 0.")
+        if num_points is None:
+            num_points = arc_segments(radius, end_angle - start_angle, tolerance)
+        start = math.radians(start_angle)
+        sweep = math.radians(end_angle) - start
+        if (self.array_backed or num_points >= VECTORIZE_THRESHOLD) and _numpy() is not None:
+            angles = start + sweep * np.arange(num_points + 1) / num_points
+            xs = center[0] + radius * np.cos(angles)
+            ys = center[1] + radius * np.sin(angles)
+            if self.array_backed:
+                return np.column_stack((xs, ys))
+            return list(zip(xs.tolist(), ys.tolist()))
         new_points = []
         for i in range(num_points + 1):
-            angle = 2 * math.pi * i / num_points
-            x = start_point[0] + radius * math.cos(angle)
-            y = start_point[1] + radius * math.sin(angle)
+            angle = start + sweep * i / num_points
+            x = center[0] + radius * math.cos(angle)
+            y = center[1] + radius * math.sin(angle)
             new_points.append((x, y))
-        return new_points        
+        return new_points
+
+    # Set the points of the shape to a circle and remember the circle, so
+    # it can be written as a true SVG circle (see iter_svg)
+    def set_circle(self, radius, center, num_points=None, tolerance=None):
+        self.set_points(self.generate_circle(radius, center, num_points, tolerance))
+        self.circle = (tuple(center), radius)
+
+    # Yield the SVG code of the shape in chunks. With curves set, shapes
+    # made by set_circle are written as an SVG circle instead of a polygon.
+    # With precision set, the outline is written as a compact path with
+    # coordinates rounded to that many decimals (see svgpath).
+    def iter_svg(self, scaling_factor=1, curves=False, precision=None):
+        if curves and self.circle is not None:
+            yield svg_circle(self.circle[0], self.circle[1], scaling_factor, precision)
+            return
+        points = self.points.tolist() if self.array_backed else self.points
+        if precision is not None:
+            yield svgpath.svg_path(points, precision, scaling_factor)
+            return
+        yield '\n  <polygon points="'
+        yield ' '.join(str(x * scaling_factor) + ',' + str(y * scaling_factor) for x, y in points)
+        yield '" style="fill:none;stroke:black;stroke-width:1"/>\n'
+
+    # Write the SVG code of the shape to a file-like object
+    def write_svg(self, file, scaling_factor=1, curves=False, precision=None):
+        file.writelines(self.iter_svg(scaling_factor, curves, precision))
 
     # Convert the shape to SVG code
-    def to_svg(self, scaling_factor=1):
-        svg = '\n  <polygon points="'
-        for point in self.points:
-            svg += str(point[0] * scaling_factor) + ',' + str(point[1] * scaling_factor) + ' '
-        svg = svg[:-1]  # remove the last space
-        svg += '" style="fill:none;stroke:black;stroke-width:1"/>\n'
-        return svg
+    def to_svg(self, scaling_factor=1, curves=False, precision=None):
+        return ''.join(self.iter_svg(scaling_factor, curves, precision))
+
+
+
+# The turns, relative to the direction of the side, and the dimensions
+# travelled that trace each type of junction. The dimensions are named
+# as in junction_dimensions.
+JUNCTION_TYPES = {
+    'captive joint slot': ((-90, 0, 90, 0, 90, 180, 90, 0, -90, 180, -90, 0, -90, 0, 90),
+                           ('a', 'b', 'a', 'c1', 'd', 'c', 'e', 'f', 'e', 'c', 'd', 'c1', 'a', 'b', 'a')),
+    'captive joint base': ((90, 0, -90, 0, 90, 0, -90), ('a', 'b', 'a', 'c2', 'a', 'b', 'a')),
+    'plain slot': ((-90, 0, 90, 0, -90, 0, 90), ('a', 'b', 'a', 'c2', 'a', 'b', 'a'))
+}
+
+
+# Get the dimensions of a junction derived from the type of screw, nut
+# and thickness of the sheet being cut
+def junction_dimensions(screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter):
+    a = sheet_thickness
+    b = slot_length
+    e = nut_thickness
+    f = nut_width
+    d = screw_length - a - e
+    g = screw_diameter
+    c = (f - g) / 2
+    c1 = 6*c
+    c2 = c1 + (f - 2*c) + c1
+    return {'a': a, 'b': b, 'c': c, 'c1': c1, 'c2': c2, 'd': d, 'e': e, 'f': f, 'g': g}
+
+
+# Paths with at least this many steps or points are generated with numpy
+# when it is installed; shorter ones are cheaper in plain Python
+VECTORIZE_THRESHOLD = 32
+
+# The largest distance, in mm, a chord of a circle or arc may stray from
+# the true curve. It is well below the width of a laser cut, and full
+# circles get at least MIN_CIRCLE_SEGMENTS segments.
+DEFAULT_CHORD_TOLERANCE = 0.05
+MIN_CIRCLE_SEGMENTS = 8
+
+
+# Get the number of segments that trace an arc of the given radius and
+# sweep (in degrees) with chords at most tolerance from the curve. A
+# chord spanning the angle t strays radius * (1 - cos(t / 2)) from it.
+def arc_segments(radius, sweep=360, tolerance=None):
+    if tolerance is None:
+        tolerance = DEFAULT_CHORD_TOLERANCE
+    if tolerance <= 0:
+        raise ValueError("Tolerance must be greater than 0.")
+    sweep = abs(math.radians(sweep))
+    minimum = max(1, math.ceil(MIN_CIRCLE_SEGMENTS * sweep / (2 * math.pi)))
+    if tolerance >= radius:
+        return minimum
+    step = 2 * math.acos(1 - tolerance / radius)
+    return max(minimum, math.ceil(sweep / step))
+
+
+# Get the SVG code of a circle, with its numbers rounded to precision
+# decimals if given
+def svg_circle(center, radius, scaling_factor=1, precision=None):
+    if precision is not None:
+        cx, cy, r = (svgpath.format_number(v * scaling_factor, precision) for v in (center[0], center[1], radius))
+        return f'<circle cx="{cx}" cy="{cy}" r="{r}" {svgpath.PATH_STYLE}/>\n'
+    return f'\n  <circle cx="{center[0] * scaling_factor}" cy="{center[1] * scaling_factor}" r="{radius * scaling_factor}" style="fill:none;stroke:black;stroke-width:1"/>\n'
+
+
+# Get the unit vector (cos, sin) of a heading in degrees. Outlines only
+# use a handful of headings, so they are cached.
+@functools.lru_cache(maxsize=4096)
+def heading_vector(heading):
+    return (math.cos(math.radians(heading)), math.sin(math.radians(heading)))
+
+
+# Trace a path from a starting point by (heading, distance) steps and
+# return the starting point followed by the point after every step.
+def trace_path(start, headings, distances, as_array=False):
+    if not as_array and len(headings) < VECTORIZE_THRESHOLD:
+        return trace_list(start, headings, distances)
+    path = PathBuilder(start)
+    path.extend(headings, distances)
+    return path.build(as_array)
+
+
+# Trace a short path into a list in plain Python, without a PathBuilder:
+# the fast path of the small outlines, such as the rectangles of junction
+# holes, that most parts are made of. For so few steps the trigonometry
+# is cheaper than looking the headings up in the heading_vector cache,
+# and gives the same vectors.
+def trace_list(start, headings, distances):
+    x, y = start
+    points = [start]
+    for heading, distance in zip(headings, distances):
+        radians = math.radians(heading)
+        x += distance * math.cos(radians)
+        y += distance * math.sin(radians)
+        points.append((x, y))
+    return points
+
+
+# Collects the steps of an outline and traces them. Steps are converted
+# to vectors with the cached heading_vector, and sides with junctions
+# come as precomputed vectors from side_vectors, so building a path does
+# no trigonometry for the parts it has seen before. Plain Python steps
+# are traced as they come, which is cheapest for the short outlines most
+# parts are made of; once numpy vectors are added the rest of the path
+# is kept as displacement vectors and traced with one cumulative sum.
+# junctions holds the (start, end) index range of every junction in the
+# traced points.
+class PathBuilder:
+    def __init__(self, start):
+        self.start = start
+        # The points traced so far and the last of them
+        self.points = [start]
+        self.x, self.y = start
+        # Displacement vectors of the steps after the traced points
+        self.dxs = []
+        self.dys = []
+        self.length = 0
+        self.junctions = []
+
+    # Add one step
+    def step(self, heading, distance):
+        cos_a, sin_a = heading_vector(heading)
+        if self.dxs:
+            self.dxs.append((distance * cos_a,))
+            self.dys.append((distance * sin_a,))
+        else:
+            self.x += distance * cos_a
+            self.y += distance * sin_a
+            self.points.append((self.x, self.y))
+        self.length += 1
+
+    # Add a sequence of steps. With numpy, large sequences are converted
+    # to vectors as whole arrays.
+    def extend(self, headings, distances):
+        if len(headings) >= VECTORIZE_THRESHOLD and _numpy() is not None:
+            radians = np.radians(np.asarray(headings, dtype=np.float64))
+            distances = np.asarray(distances, dtype=np.float64)
+            self.extend_vectors(distances * np.cos(radians), distances * np.sin(radians))
+            return
+        for heading, distance in zip(headings, distances):
+            self.step(heading, distance)
+
+    # Add steps given directly as displacement vectors. Vectors given as
+    # lists or tuples of floats are traced at once, arrays are kept for
+    # build.
+    def extend_vectors(self, dxs, dys):
+        if self.dxs or not isinstance(dxs, (list, tuple)):
+            self.dxs.append(dxs)
+            self.dys.append(dys)
+        elif dxs:
+            # accumulate adds the steps one at a time, like step does
+            xs = list(itertools.accumulate(dxs, initial=self.x))
+            ys = list(itertools.accumulate(dys, initial=self.y))
+            self.points.extend(zip(xs[1:], ys[1:]))
+            self.x = xs[-1]
+            self.y = ys[-1]
+        self.length += len(dxs)
+
+    # Add a side with junctions
+    def extend_side(self, length, direction, junction_name, num_junctions, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter):
+        dxs, dys, junctions = side_vectors(length, direction, junction_name, num_junctions, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter)
+        # The point after step i of the side is point self.length + 1 + i
+        offset = self.length + 1
+        self.junctions += [(start + offset, end + offset) for start, end in junctions]
+        self.extend_vectors(dxs, dys)
+
+    # Trace the path into a list of (x, y) tuples, or into an Nx2 array
+    def build(self, as_array=False):
+        points = self.points
+        if not self.dxs and not as_array:
+            return points
+        _numpy()
+        if not self.dxs:
+            return np.array(points, dtype=np.float64)
+        # Starting the cumulative sum at the last traced point adds the
+        # steps in the same order as tracing them one at a time
+        xs = np.cumsum(np.concatenate([(self.x,)] + self.dxs))[1:]
+        ys = np.cumsum(np.concatenate([(self.y,)] + self.dys))[1:]
+        if as_array:
+            return np.vstack((np.array(points, dtype=np.float64), np.column_stack((xs, ys))))
+        points.extend(zip(xs.tolist(), ys.tolist()))
+        return points
+
+
+# Get the steps that trace a junction as (headings, distances)
+@functools.lru_cache(maxsize=1024)
+def junction_steps(junction_name, direction, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter):
+    dims = junction_dimensions(screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter)
+    angles, distances = JUNCTION_TYPES[junction_name]
+    headings = tuple((direction + angle + 360) % 360 for angle in angles)
+    return headings, tuple(dims[distance] for distance in distances)
+
+
+# Get the steps that trace a side with junctions as (headings, distances,
+# junctions), where junctions holds the (start, end) range of the points
+# of every junction among the points after each step. A junction starts
+# with a zero length step, so its first point is repeated as in the
+# points stored by complex_junction.
+@functools.lru_cache(maxsize=1024)
+def side_steps(length, direction, junction_name, num_junctions, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter):
+    dims = junction_dimensions(screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter)
+    b, c1, g = dims['b'], dims['c1'], dims['g']
+    junction_length = b + c1 + g + c1 + b
+    remaining_length = (length - (junction_length * num_junctions)) / (num_junctions + 1)
+    if remaining_length < 0:
+        raise ValueError(f"Error: a side of length {length:.4g} is too short for {int(num_junctions)} junctions "
+                         f"of length {junction_length:.4g}")
+    junction_headings, junction_distances = junction_steps(junction_name, direction, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter)
+    headings = []
+    distances = []
+    junctions = []
+    for i in range(int(num_junctions)):
+        headings += [direction, direction]
+        distances += [remaining_length, 0]
+        start = len(headings) - 1
+        headings += junction_headings
+        distances += junction_distances
+        junctions.append((start, len(headings)))
+        headings.append(direction)
+        distances.append(remaining_length)
+    return tuple(headings), tuple(distances), tuple(junctions)
+
+
+# Get a side with junctions as the displacement vectors (dxs, dys) of
+# its steps and the junction ranges from side_steps, cached per side.
+# Like in PathBuilder.extend, only long sides are converted to arrays, so
+# a path too short to trace with numpy only holds Python floats.
+@functools.lru_cache(maxsize=1024)
+def side_vectors(length, direction, junction_name, num_junctions, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter):
+    headings, distances, junctions = side_steps(length, direction, junction_name, num_junctions, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter)
+    vectors = [heading_vector(heading) for heading in headings]
+    dxs = tuple(distance * cos_a for distance, (cos_a, _) in zip(distances, vectors))
+    dys = tuple(distance * sin_a for distance, (_, sin_a) in zip(distances, vectors))
+    if len(headings) >= VECTORIZE_THRESHOLD and _numpy() is not None:
+        dxs = np.array(dxs, dtype=np.float64)
+        dys = np.array(dys, dtype=np.float64)
+    return dxs, dys, junctions
+
+
+# Compile a junction into the offsets of its points from its starting
+# point. Templates are kept in an LRU cache, so a junction is only traced
+# once per direction and hardware spec.
+@functools.lru_cache(maxsize=1024)
+def compile_junction(junction_name, direction, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter):
+    headings, distances = junction_steps(junction_name, direction, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter)
+    return tuple(trace_path((0.0, 0.0), headings, distances)[1:])
+
+
+# Compile a side with junctions into the offsets of its points from the
+# starting point, and the (start, end) index range of every junction in
+# them. Sides are kept in an LRU cache like the junctions.
+@functools.lru_cache(maxsize=1024)
+def compile_side(length, direction, junction_name, num_junctions, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter):
+    path = PathBuilder((0.0, 0.0))
+    path.extend_side(length, direction, junction_name, num_junctions, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter)
+    return tuple(path.build()[1:]), tuple((start - 1, end - 1) for start, end in path.junctions)
+
+
+# Raised when a shape or component added to a component lies outside the
+# mother shape ('outside') or overlaps one of its other children
+# ('overlap'). shape is the child being checked and other is the child
+# it collides with, or the mother shape.
+class CollisionError(ValueError):
+    def __init__(self, kind, shape, other, component=None):
+        self.kind = kind
+        self.shape = shape
+        self.other = other
+        self.component = component
+        name = component.name if component is not None else 'component'
+        if kind == 'outside':
+            message = f"Error: The shape you are trying to add is not inside the mother shape of {name}"
+        else:
+            message = f"Error: The shape you are trying to add overlaps another shape of {name}"
+        super().__init__(message)
+
 
+# Components with fewer children than this check a new child against
+# all of them instead of building a grid index
+INDEX_THRESHOLD = 16
 
 
 # The Component class represents a group of 2D shapes needed.
@@ -255,23 +730,38 @@ class Shape:
 # as the mother shape. The component can be moved around as a
 # whole and rotated.
 class Component:
-    # Initialize Component class with a name, mother shape, and shapes
-    def __init__(self, name = 'default', mother_shape=None, shapes=[], components=[], fractal=[]):
+    __slots__ = ('name', 'data', 'index', 'transform', 'placed')
+
+    # Initialize Component class with a name, mother shape, and shapes.
+    # Every component gets its own lists for the shapes, components and
+    # fractal that are not given.
+    def __init__(self, name = 'default', mother_shape=None, shapes=None, components=None, fractal=None):
         self.name = name
-        if shapes is None:
-            self.shapes = []
-        else:
-            self.shapes = shapes
-        if components is None:
-            self.components = []
-        else:
-            self.components = components
         self.data = {
             'mother_shape': mother_shape,
-            'shapes': shapes,
-            'components': components,
-            'fractal' : fractal
+            'shapes': [] if shapes is None else shapes,
+            'components': [] if components is None else components,
+            'fractal' : [] if fractal is None else fractal
         }
+        # Grid index over the outlines of the shapes and child components,
+        # in local coordinates, rebuilt lazily after bake
+        self.index = None
+        # Where the component is placed, as an affine transform (see
+        # geometry) from its local coordinates, which its children keep,
+        # to outer coordinates. None is the identity. Moving the component
+        # only updates the transform; the children are placed on demand.
+        self.transform = None
+        self.placed = None
+
+    # The shapes of the component in local coordinates
+    @property
+    def shapes(self):
+        return self.data['shapes']
+
+    # The child components of the component in local coordinates
+    @property
+    def components(self):
+        return self.data['components']
 
     # Checks if point is a tuple of two numbers
     def __is_valid_point(self, point):
@@ -302,21 +792,103 @@ class Component:
             raise ValueError("Error: No fractal has been set for this component")
         return fractal
 
-    # Get the mother shape of the component
-    def get_mother_shape(self, ignore_Error=False):
+    # Get the mother shape of the component, placed by the transform of
+    # the component unless local is set. Once the component has moved the
+    # placed shape is a copy, and changes to it are lost: change the
+    # shape from get_mother_shape(local=True) instead.
+    def get_mother_shape(self, ignore_Error=False, local=False):
         mother_shape = self.data['mother_shape']
         if not ignore_Error and not mother_shape:
             raise ValueError("Error: No mother shape has been set for this component.")
-        return mother_shape
+        if local or mother_shape is None or self.transform is None:
+            return mother_shape
+        return self.__placed('mother_shape', (mother_shape.version,), lambda: mother_shape.transformed(self.transform))
+
+    # Get the shapes in the component placed by its transform. get_shapes
+    # returns them in local coordinates. Like the mother shape, placed
+    # shapes are copies once the component has moved.
+    def get_placed_shapes(self):
+        shapes = self.data['shapes']
+        if self.transform is None:
+            return shapes
+        versions = tuple(shape.version for shape in shapes)
+        return self.__placed('shapes', versions, lambda: [shape.transformed(self.transform) for shape in shapes])
+
+    # Get the child components placed by the transform of the component.
+    # These are views that share the children of the child components and
+    # are only meant to be read.
+    def get_placed_components(self):
+        components = self.data['components']
+        if self.transform is None:
+            return components
+        transforms = tuple((id(component.data), component.transform) for component in components)
+        return self.__placed('components', transforms, lambda: [self.__place_component(component) for component in components])
 
-    # Get the center point of the entire component as an x,y tuple
+    # Get the fractal placed by the transform of the component
+    def get_placed_fractal(self):
+        fractal = self.data['fractal']
+        if self.transform is None or not fractal:
+            return fractal
+        return self.__placed('fractal', tuple(fractal), lambda: geometry.transform_points(self.transform, fractal))
+
+    # Look up children placed in outer coordinates, placing them on a miss
+    # or when the children changed since: state describes the children as
+    # they were placed (the versions of the shapes, for instance)
+    def __placed(self, key, state, place):
+        if self.placed is None:
+            self.placed = {}
+        entry = self.placed.get(key)
+        if entry is None or entry[0] != state:
+            entry = self.placed[key] = (state, place())
+        return entry[1]
+
+    def __place_component(self, component):
+        placed = component.view()
+        placed.transform = geometry.compose(self.transform, component.transform)
+        return placed
+
+    # Get a view of the component: a component that shares the children
+    # of this one but is moved on its own. Moving the view does not move
+    # this component; adding to it or baking it changes both.
+    def view(self):
+        view = Component(self.name)
+        view.data = self.data
+        view.transform = self.transform
+        return view
+
+    def __set_transform(self, matrix):
+        self.transform = matrix
+        self.placed = None
+
+    # Apply the transform to the points of the mother shape, the shapes,
+    # the fractal and the child components, so the local coordinates are
+    # where the component is placed, and reset the transform.
+    def bake(self):
+        matrix = self.transform
+        if matrix is None:
+            return
+        self.data['mother_shape'].apply_transform(matrix)
+        for shape in self.data['shapes']:
+            shape.apply_transform(matrix)
+        for component in self.data['components']:
+            component.__set_transform(geometry.compose(matrix, component.transform))
+            component.bake()
+        fractal = self.data['fractal']
+        if fractal:
+            fractal[:] = geometry.transform_points(matrix, fractal)
+        self.__set_transform(None)
+        self.index = None
+
+    # Get the center point of the entire component as an x,y tuple. The
+    # centroid moves with the transform, so no points are placed for it.
     def get_center(self):
-        return self.get_mother_shape().get_center()
+        return geometry.transform_point(self.transform, self.get_mother_shape(local=True).get_center())
 
     def set_mother_shape(self, shape):
         if not isinstance(shape, Shape):
             raise ValueError("Error: Input variable is not a shape")
         self.data['mother_shape'] = shape
+        self.placed = None
 
     # Returns the bounding box of the mother shape, or an error message if no mother shape has been set
     def get_bounding_box(self):
@@ -336,56 +908,150 @@ class Component:
         bb2 = box2.get_bounding_box()
         return bb1[0] >= bb2[0] and bb1[1] >= bb2[1] and bb1[2] <= bb2[2] and bb1[3] <= bb2[3]
 
-    # Add a shape to the component
+    # Get the outline of a child shape or child component
+    def __outline(self, child):
+        if isinstance(child, Component):
+            return child.get_mother_shape().get_points()
+        return child.get_points()
+
+    # Get the spatial index over the children, building it if needed.
+    # Children added with add_shape and add_component are inserted as they
+    # come. Changes made to the lists directly are only noticed when they
+    # change the number of children: after replacing a child in place or
+    # moving one that was already added, call invalidate_index.
+    def get_index(self):
+        shapes = self.data['shapes']
+        components = self.data['components']
+        if self.index is None or len(self.index) != len(shapes) + len(components):
+            boxes = [(child, child.get_bounding_box()) for child in itertools.chain(shapes, components)]
+            self.index = geometry.GridIndex(self.__cell_size([box for _, box in boxes]))
+            for child, box in boxes:
+                self.index.insert(child, box)
+        return self.index
+
+    # Drop the index over the children, so get_index builds it again
+    def invalidate_index(self):
+        self.index = None
+
+    # Get the cell size of the index: twice the median size of the
+    # children, so a typical child touches few cells whatever was added
+    # first, or an eighth of the mother shape while there are none
+    def __cell_size(self, boxes):
+        if boxes:
+            sizes = sorted(max(box[2] - box[0], box[3] - box[1]) for box in boxes)
+            return max(sizes[len(sizes) // 2], geometry.EPSILON) * 2
+        mother = self.data['mother_shape']
+        if mother is None or len(mother.points) == 0:
+            return None
+        box = mother.get_bounding_box()
+        return max(box[2] - box[0], box[3] - box[1], geometry.EPSILON) / 8
+
+    # Get the children a new child could overlap. Small components are
+    # scanned directly; the index is only built once there are
+    # INDEX_THRESHOLD children.
+    def __candidates(self, child):
+        shapes = self.data['shapes']
+        components = self.data['components']
+        if self.index is None and len(shapes) + len(components) < INDEX_THRESHOLD:
+            return shapes + components
+        return self.get_index().query(child.get_bounding_box())
+
+    # Add a child to the list it belongs in and to the index, if built
+    def __append(self, key, child):
+        self.data[key].append(child)
+        if self.index is not None:
+            self.index.insert(child, child.get_bounding_box())
+
+    # Find what a child collides with: the mother shape when it is not
+    # inside it, or the first other child it overlaps. Returns a
+    # CollisionError, or None when there is no collision.
+    def __find_collision(self, child, candidates):
+        mother = self.get_mother_shape(local=True)
+        outline = self.__outline(child)
+        if not self.__inside_shape(child, mother) or not geometry.polygon_inside(outline, mother.get_points()):
+            return CollisionError('outside', child, mother, self)
+        for other in candidates:
+            if other is not child and geometry.polygons_overlap(outline, self.__outline(other)):
+                return CollisionError('overlap', child, other, self)
+        return None
+
+    # Check every child against the mother shape and the other children
+    # and return the collisions as a list of CollisionErrors. Each
+    # overlapping pair is reported once.
+    def find_collisions(self):
+        index = self.get_index()
+        collisions = []
+        checked = set()
+        mother = self.get_mother_shape(local=True)
+        for child in self.data['shapes'] + self.data['components']:
+            outline = self.__outline(child)
+            if not self.__inside_shape(child, mother) or not geometry.polygon_inside(outline, mother.get_points()):
+                collisions.append(CollisionError('outside', child, mother, self))
+            checked.add(id(child))
+            for other in index.query(child.get_bounding_box()):
+                if id(other) not in checked and geometry.polygons_overlap(outline, self.__outline(other)):
+                    collisions.append(CollisionError('overlap', child, other, self))
+        return collisions
+
+    # Add a shape to the component. Unless ignore_error is set, the shape
+    # must lie inside the mother shape and not overlap the other shapes,
+    # otherwise a CollisionError is raised and the shape is not added
+    # and stays where it was. A component that has been moved is baked
+    # first, so the point is where the shape ends up.
     def add_shape(self, shape, point, mother=False, ignore_error=False):
+        self.bake()
         if mother:
             self.set_mother_shape(shape)
         else:
-            if not ignore_error and not self.__inside_shape(shape, self.get_mother_shape()) and not self.__is_valid_point(point):
-                raise ValueError("Error: The shape you are trying to add is larger than mother shape")
-            else:
-                shape.move_to(point[0], point[1])
-                self.data['shapes'].append(shape)
-
-    # Add a component to the component
+            self.__is_valid_point(point)
+            # Moving a shape replaces its points, so the old ones can be
+            # put back as they were
+            points, circle = shape.points, shape.circle
+            shape.move_to(point[0], point[1])
+            if not ignore_error:
+                collision = self.__find_collision(shape, self.__candidates(shape))
+                if collision is not None:
+                    shape.points, shape.circle = points, circle
+                    shape.invalidate_cache()
+                    raise collision
+            self.__append('shapes', shape)
+
+    # Add a component to the component. The component must lie inside
+    # the mother shape and not overlap the other children, otherwise a
+    # CollisionError is raised and the component is not added and stays
+    # where it was.
     def add_component(self, component, point):
-        current_box = self.get_bounding_box()
-        new_box = component.get_bounding_box()
-        if self.__inside_shape(new_box, current_box) and self.__is_valid_point(point):
-            component.move_to(point[0], point[1])
-            self.data['components'].append(component)
-        else:
-            return "Error: The component you are trying to add is larger than mother component"
-
-    # Moves the component to a new x and y position
+        self.bake()
+        self.__is_valid_point(point)
+        transform = component.transform
+        component.move_to(point[0], point[1])
+        collision = self.__find_collision(component, self.__candidates(component))
+        if collision is not None:
+            component.__set_transform(transform)
+            raise collision
+        self.__append('components', component)
+
+    # Moves the component to a new x and y position. The center of the
+    # mother shape ends up at (x, y) and everything else moves with it.
     def move_to(self, x, y):
-        self.get_mother_shape().move_to(x, y)
-        try:
-            for shape in self.get_shapes():
-                shape.move_to(x, y)
-        except ValueError:
-            pass
-        try:
-            for component in self.get_components():
-                component.move_to(x, y)
-        except ValueError:
-            pass
-
-    # Rotate the component and its child components by a specified angle around the center.
-    def rotate(self, angle):
-        self.get_mother_shape().rotate(angle)
-        try:
-            for shape in self.get_shapes():
-                shape.rotate(angle)
-        except ValueError:
-            pass
-        try:
-            for component in self.get_components():
-                component.rotate(angle)
-        except ValueError:
-            pass
-
-    def generate_junction_holes(self, point, direction, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter, include_screw=True):
+        mother_x, mother_y = self.get_center()
+        self.translate(x - mother_x, y - mother_y)
+
+    # Moves the component and everything in it by the given offset
+    def translate(self, offset_x, offset_y):
+        self.__set_transform(geometry.compose(geometry.translation(offset_x, offset_y), self.transform))
+
+    # Rotate the component and its child components by a specified angle
+    # around the center of the mother shape, or around origin if given.
+    def rotate(self, angle, origin=None):
+        if origin is None:
+            origin = self.get_center()
+        self.__set_transform(geometry.compose(geometry.rotation(angle, origin), self.transform))
+
+    # Generate the two slots and the screw hole of a junction as shapes of
+    # the component. The holes are checked for collisions with the mother
+    # shape and the other shapes unless ignore_error is set.
+    def generate_junction_holes(self, point, direction, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter, include_screw=True, ignore_error=False):
             # parameters that will change depending on the type
             # of screw, nut and thickness of the sheet being cut
             a = sheet_thickness
@@ -400,13 +1066,13 @@ class Component:
 
             slot1 = Shape()
             slot1.set_points(slot1.generate_rectangle(b, a, direction, point))
-            self.add_shape(slot1, point, ignore_error=True)
+            self.add_shape(slot1, point, ignore_error=ignore_error)
 
             dist = c1 + g + c1
             next_point1 = (point[0] + b + dist, point[1])
             slot2 = Shape()
             slot2.set_points(slot2.generate_rectangle(b, a, direction, next_point1))
-            self.add_shape(slot2, next_point1, ignore_error=True)
+            self.add_shape(slot2, next_point1, ignore_error=ignore_error)
 
             gap_start = slot1.get_points()[1]
             gap_end = slot2.get_points()[0]
@@ -416,67 +1082,432 @@ class Component:
 
             if include_screw:
                 circle = Shape()
-                circle.set_points(circle.generate_circle(g, next_point))
-                self.add_shape(circle, next_point, ignore_error=True)
-
-    def generate_text(self, text, point, direction):
+                circle.set_circle(g, next_point)
+                self.add_shape(circle, next_point, ignore_error=ignore_error)
+
+    # Generate SVG code for text centered at the point. The text width is
+    # estimated from the number of characters unless font_metrics is set,
+    # in which case the font is loaded and the real advance widths are used.
+    # With outline set the text is written as the glyph outlines of the
+    # font, centered by its real width, so it is ready to cut; glyphs are
+    # traced once per font and size (see fonts). Without matplotlib it
+    # falls back to <text>.
+    def generate_text(self, text, point, direction, font_metrics=False, font_family='sans-serif', outline=False):
         x, y = point
         font_size = int(0.001 * self.get_mother_shape().get_area())
-        text_width = len(text) * font_size / 2.35
+        glyphs = None
+        if outline:
+            try:
+                text_width, glyphs = fonts.layout_text(text, font_size, font_family)
+            except ImportError:
+                glyphs = None
+        if glyphs is None:
+            if font_metrics:
+                text_width = fonts.text_width(text, font_size, font_family)
+            else:
+                text_width = len(text) * font_size / 2.35
         x -= text_width / 2
         y += font_size / 2 + self.get_length() / 5
+        if glyphs is not None:
+            return fonts.outline_svg(glyphs, x, y, direction)
         svg_code = f'<text x="{x}" y="{y}" font-size="{font_size}" transform="rotate({direction}, {x}, {y})">{text}</text>\n'
         return svg_code
 
-    def embed_logo(self, point, scaling_factor):
-        logo_file = "logo.svg"
-        with open(logo_file, "r") as file:
-            logo_svg = file.read()
-        width, height = self.get_logo_dimensions(logo_svg)
+    # Get the SVG code of the logo centered at point. The logo file is
+    # read and parsed once and cached until it changes (see assets).
+    def embed_logo(self, point, scaling_factor, logo_file="logo.svg"):
+        logo = assets.load_logo(logo_file)
         x, y = point
-        x -= width * scaling_factor / 2
-        y -= height * scaling_factor / 2
-        svg_code = f'<g transform="translate({x}, {y}) scale({scaling_factor})">\n{logo_svg}\n</g>\n'
-        return svg_code
+        x -= logo.width * scaling_factor / 2
+        y -= logo.height * scaling_factor / 2
+        return assets.PlacedLogo(logo, x, y, scaling_factor)
 
+    # Get the width and height of the root element of SVG code
     def get_logo_dimensions(self, logo_svg):
-        width_start = logo_svg.index("width") + 7
-        width_end = logo_svg.index("\"", width_start)
-        height_start = logo_svg.index("height") + 8
-        height_end = logo_svg.index("\"", height_start)
+        logo = assets.Logo(None, logo_svg)
+        return (logo.width, logo.height)
+
+    # Yield the SVG representation of the component in chunks: the
+    # mother shape, then its shapes, its child components and its fractal.
+    # curves and precision are passed on to Shape.iter_svg.
+    def iter_svg(self, scaling_factor=1, curves=False, precision=None):
+        yield from self.get_mother_shape().iter_svg(scaling_factor, curves, precision)
+        for shape in self.get_placed_shapes():
+            yield from shape.iter_svg(scaling_factor, curves, precision)
+        for component in self.get_placed_components():
+            yield from component.iter_svg(scaling_factor, curves, precision)
+        fractal = self.get_placed_fractal()
+        if fractal:
+            yield from iter_fractal_svg(fractal, scaling_factor, precision)
+
+    # Writes the SVG representation of the component to a file-like object
+    def write_svg(self, file, scaling_factor=1, curves=False, precision=None):
+        file.writelines(self.iter_svg(scaling_factor, curves, precision))
 
-        width = float(logo_svg[width_start:width_end])
-        height = float(logo_svg[height_start:height_end])
+    # Converts the component to an SVG representation as a string
+    def to_svg(self, svg_code="", scaling_factor=1, curves=False, precision=None):
+        return svg_code + ''.join(self.iter_svg(scaling_factor, curves, precision))
+
+
+# Yield the SVG code of a fractal given as a list of (x, y) points,
+# as an open compact path if precision is set
+def iter_fractal_svg(fractal, scaling_factor=1, precision=None):
+    if precision is not None:
+        yield svgpath.svg_path(fractal, precision, scaling_factor, closed=False)
+        return
+    yield '<polyline points="'
+    yield " ".join(f"{x * scaling_factor},{y * scaling_factor}" for x, y in fractal)
+    yield '" style="fill:none;stroke:black;stroke-width:1"/>\n'
+
+
+# Get the header of an SVG document of the given size. With xlink set
+# the xlink namespace used by <use> elements is declared.
+def svg_header(width=500, height=500, scaling_factor=1, xlink=False):
+    namespaces = 'xmlns="http://www.w3.org/2000/svg"'
+    if xlink:
+        namespaces += ' xmlns:xlink="http://www.w3.org/1999/xlink"'
+    return '<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n<!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 1.1//EN"\n"http://www.w3.org/Graphics/SVG/1.1/DTD/svg11.dtd">\n\n<svg width="{0}" height="{1}"\n{2}>\n\n'.format(width * scaling_factor, height * scaling_factor, namespaces)
+
+
+# Yield a whole SVG document in chunks. Parts can be shapes, components
+# or already rendered SVG code such as the output of generate_text and
+# embed_logo, and are written in the given order. With curves set,
+# circles are written as SVG circles instead of polygons, and with
+# precision set outlines are written as compact paths. With instances
+# set, congruent shapes and components are written once in <defs> and
+# placed with <use>; leave it off for cutters that do not support <use>.
+# With symbols set, each logo from embed_logo is written once as a
+# <symbol> and placed with <use>.
+def iter_svg_document(parts, width=500, height=500, scaling_factor=1, curves=False, precision=None, instances=False,
+                      symbols=False):
+    yield svg_header(width, height, scaling_factor, xlink=instances or symbols)
+    if symbols:
+        defs, parts = assets.logo_symbols(parts)
+        yield defs
+    if instances:
+        yield from iter_instanced_svg(parts, scaling_factor, curves, precision)
+    else:
+        for part in parts:
+            if isinstance(part, str):
+                yield part
+            else:
+                yield from part.iter_svg(scaling_factor, curves, precision)
+    yield "</svg>"
+
+
+# Write a whole SVG document to a file-like object
+def write_svg_document(file, parts, width=500, height=500, scaling_factor=1, curves=False, precision=None, instances=False,
+                       symbols=False):
+    file.writelines(iter_svg_document(parts, width, height, scaling_factor, curves, precision, instances, symbols))
+
+
+# Outlines are rounded to this many decimals when looking for congruent
+# shapes and components
+INSTANCE_DIGITS = 6
+
+
+# Get the frame of an outline as (x, y, angle): its first point and the
+# direction of its first edge in degrees. Congruent outlines that start
+# at the same vertex have the same points in their own frames.
+def instance_frame(points):
+    x0, y0 = points[0]
+    for x, y in points[1:]:
+        if x != x0 or y != y0:
+            return (x0, y0, math.degrees(math.atan2(y - y0, x - x0)))
+    return (x0, y0, 0.0)
+
+
+# Get points in the given frame
+def to_frame(points, frame):
+    x0, y0, angle = frame
+    cos_a = math.cos(math.radians(angle))
+    sin_a = math.sin(math.radians(angle))
+    return [((x - x0) * cos_a + (y - y0) * sin_a, (y - y0) * cos_a - (x - x0) * sin_a) for x, y in points]
+
+
+# Get the loops of a shape or component in the order iter_svg writes
+# them, as (points, closed, circle) tuples
+def _instance_loops(part):
+    if isinstance(part, Shape):
+        return [(part.get_points(), True, part.circle)]
+    loops = _instance_loops(part.get_mother_shape())
+    for child in part.get_placed_shapes() + part.get_placed_components():
+        loops += _instance_loops(child)
+    if part.data['fractal']:
+        loops.append((part.get_placed_fractal(), False, None))
+    return loops
+
+
+# Get the loops of a shape or component in the frame of its outline,
+# with a key that is equal for congruent parts
+def _instance_key(part):
+    outline = part if isinstance(part, Shape) else part.get_mother_shape()
+    frame = instance_frame(outline.get_points())
+    loops = []
+    for points, closed, circle in _instance_loops(part):
+        points = to_frame(points, frame)
+        if circle is not None:
+            circle = (to_frame([circle[0]], frame)[0], circle[1])
+        loops.append((points, closed, circle))
+    key = tuple((closed, circle is not None, tuple((round(x, INSTANCE_DIGITS), round(y, INSTANCE_DIGITS)) for x, y in points))
+                for points, closed, circle in loops)
+    return key, frame, loops
+
+
+# Get the shapes of a component and of its child components
+def _instance_shapes(component):
+    shapes = list(component.get_placed_shapes())
+    for child in component.get_placed_components():
+        shapes += _instance_shapes(child)
+    return shapes
+
+
+# Yield the SVG code of loops given as (points, closed, circle) tuples
+def _iter_loops_svg(loops, scaling_factor=1, curves=False, precision=None):
+    for points, closed, circle in loops:
+        if closed:
+            shape = Shape(list(points))
+            shape.circle = circle
+            yield from shape.iter_svg(scaling_factor, curves, precision)
+        else:
+            yield from iter_fractal_svg(points, scaling_factor, precision)
+
+
+# Get the SVG code that places an instance at a frame
+def _svg_use(name, frame, scaling_factor=1, precision=None):
+    x, y, angle = frame
+    if precision is None:
+        transform = f'translate({x * scaling_factor} {y * scaling_factor})'
+        angle = str(angle) if angle else ''
+    else:
+        transform = f'translate({svgpath.format_number(x * scaling_factor, precision)} {svgpath.format_number(y * scaling_factor, precision)})'
+        angle = svgpath.format_number(angle, INSTANCE_DIGITS)
+        angle = '' if angle == '0' else angle
+    if angle:
+        transform += f' rotate({angle})'
+    return f'<use xlink:href="#{name}" transform="{transform}"/>\n'
+
+
+# Yield the body of an SVG document with congruent parts written once.
+# Shapes and components that occur more than once, and the shapes inside
+# the other components that occur more than once, are written to <defs>
+# in the frame of their first occurrence and placed with <use>.
+def iter_instanced_svg(parts, scaling_factor=1, curves=False, precision=None):
+    found = {}
+    counts = {}
+
+    def count(part):
+        key, frame, loops = found[id(part)] = _instance_key(part)
+        counts.setdefault(key, [0, loops])[0] += 1
+
+    for part in parts:
+        if isinstance(part, (Shape, Component)):
+            count(part)
+    for part in parts:
+        if isinstance(part, Component) and counts[found[id(part)][0]][0] == 1:
+            for shape in _instance_shapes(part):
+                count(shape)
+
+    names = {}
+    for key, (number, loops) in counts.items():
+        if number > 1:
+            names[key] = f'instance{len(names) + 1}'
+    if names:
+        yield '<defs>\n'
+        for key, name in names.items():
+            yield f'<g id="{name}">\n'
+            yield from _iter_loops_svg(counts[key][1], scaling_factor, curves, precision)
+            yield '</g>\n'
+        yield '</defs>\n'
+
+    # Child components are not instanced themselves, only their shapes
+    def place(part):
+        entry = found.get(id(part))
+        if entry is not None and entry[0] in names:
+            yield _svg_use(names[entry[0]], entry[1], scaling_factor, precision)
+        elif isinstance(part, Shape):
+            yield from part.iter_svg(scaling_factor, curves, precision)
+        else:
+            yield from part.get_mother_shape().iter_svg(scaling_factor, curves, precision)
+            for child in part.get_placed_shapes() + part.get_placed_components():
+                yield from place(child)
+            if part.data['fractal']:
+                yield from iter_fractal_svg(part.get_placed_fractal(), scaling_factor, precision)
+
+    for part in parts:
+        if isinstance(part, str):
+            yield part
+        elif isinstance(part, (Shape, Component)):
+            yield from place(part)
+        else:
+            yield from part.iter_svg(scaling_factor, curves, precision)
+
+# Offset the outlines of shapes by a distance each in one batch (see
+# geometry.offset_polygons). Circles stay circles with the new radius.
+def offset_shapes(shapes, distances, miter_limit=geometry.MITER_LIMIT):
+    outlines = geometry.offset_polygons([shape.points for shape in shapes], distances, miter_limit)
+    for shape, distance, outline in zip(shapes, distances, outlines):
+        circle = shape.circle
+        shape.set_points(outline)
+        if circle is not None:
+            shape.circle = (circle[0], circle[1] + distance)
+
+
+# Collect the outlines of a component and its children with the distance
+# each is offset by for kerf compensation
+def _kerf_outlines(component, kerf, shapes, distances):
+    mother = component.data['mother_shape']
+    if mother is not None:
+        shapes.append(mother)
+        distances.append(kerf / 2)
+    for shape in component.data['shapes']:
+        shapes.append(shape)
+        distances.append(-kerf / 2)
+    for child in component.data['components']:
+        _kerf_outlines(child, kerf, shapes, distances)
+    component.index = None
+    component.placed = None
+
+
+# Compensate parts (Shapes or Components) for the width of the cut: the
+# laser takes kerf/2 from each side of its path, so outer outlines are
+# offset outward and the holes inside them inward by kerf/2, and the
+# parts come out at their nominal size. Child components are parts cut
+# on their own, so their outlines are offset outward too. Every outline
+# of every part is offset in one batch, in local coordinates. Offsetting
+# can hide an outline that crosses itself, so the nominal outlines are
+# validated first and an OutlineError (see validate.check_parts) is
+# raised when one of them is unfit to cut. Outlines are offset the same
+# way whichever way they wind, so the winding is not checked.
+def compensate_kerf(parts, kerf, miter_limit=geometry.MITER_LIMIT):
+    if not kerf:
+        return
+    validate.check_parts(parts, winding=None)
+    shapes = []
+    distances = []
+    for part in parts:
+        if isinstance(part, Component):
+            _kerf_outlines(part, kerf, shapes, distances)
+        elif isinstance(part, Shape):
+            shapes.append(part)
+            distances.append(kerf / 2)
+    offset_shapes(shapes, distances, miter_limit)
+
+
+# Build the tower piece: a rectangle with plain slots along its bottom
+# side and a pair of junction holes for every shelf. The dimensions are
+# nominal; with kerf set the outlines are compensated for the cut.
+def build_tower(length, width, num_shelves, num_junctions, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter, starting_point=(20, 20), kerf=0):
+    tower_shape = Shape()
+    tower_shape.set_points(Shape().generate_rectangle_tower(length, width,'plain slot', num_junctions, starting_point, 0, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter))
+    tower = Component('tower')
+    tower.add_shape(tower_shape, starting_point, True)
+    c = (nut_width - screw_diameter) / 2
+    c1 = 6*c
+    tower_x = tower_shape.get_x() - (c1 + screw_diameter/2)
+    tower_y = starting_point[1]
+    shelf_height = length / (num_shelves + 1)
+    for i in range(num_shelves):
+        tower_y += shelf_height
+        tower.generate_junction_holes((tower_x, tower_y), 0, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter)
+    compensate_kerf([tower], kerf)
+    return tower
 
-        return (width, height)
 
-    # Converts the component to an SVG representation as a string
-    def to_svg(self, svg_code="", scaling_factor=1):
-        svg_code += self.get_mother_shape().to_svg(scaling_factor)
-        try:
-            for shape in self.get_shapes():
-                svg_code += shape.to_svg(scaling_factor)
-        except ValueError:
-            # Handle the error by not adding any shapes to the svg code
-            pass
-        try:
-            for component in self.get_components():
-                svg_code += component.to_svg(scaling_factor)
-        except ValueError:
-            # Handle the error by not adding any components to the svg code
-            pass
-        try:
-            fractal = self.data['fractal']
-            if fractal:
-                points = " ".join(f"{x * scaling_factor},{y * scaling_factor}" for x, y in fractal)
-                svg_code += f'<polyline points="{points}" style="fill:none;stroke:black;stroke-width:1"/>\n'
-        except ValueError:
-            # Handle the error by not adding any fractals to the svg code
-            pass
-        return svg_code
+# Build the polygon shelves, each with one captive joint slot, compensated
+# for kerf like the tower
+def build_shelves(length, width, shelf_area, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter, starting_point=(20, 20), kerf=0):
+    starting_points = [(starting_point[0]+(width*2), starting_point[1]),
+                    (starting_point[0]+(width*2), starting_point[1]+(length*0.6))]
+    num_sides = [6, 4]
+    shelves = []
+    for i in range(len(num_sides)):
+        new_starting_point = starting_points[i]
+        shelf_shape = Shape()
+        shelf_shape.set_points(shelf_shape.generate_polygon_with_junctions(num_sides[i],'captive joint slot', 1, shelf_area/num_sides[i], new_starting_point, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter))
+        shelf = Component('shelf')
+        shelf.add_shape(shelf_shape, new_starting_point, True)
+        shelves.append(shelf)
+    compensate_kerf(shelves, kerf)
+    return shelves
 
-if __name__ == '__main__':
 
+# Build the base piece with its junction holes, compensated for kerf
+# like the tower
+def build_base(length, width, base_area, kerf, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter, starting_point=(20, 20)):
+    c = (nut_width - screw_diameter) / 2
+    c1 = 6*c
+    base_point = (starting_point[0]+(width*3.5), starting_point[1])
+    base_shape = Shape()
+    base_shape.set_points(base_shape.generate_polygon(7, base_area/7, base_point))
+    base = Component('base')
+    base.add_shape(base_shape, base_point, True)
+    base.generate_junction_holes((base_shape.get_x() - (c1 - screw_diameter/2 + slot_length), base_shape.get_y()), 0, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter, False)
+    compensate_kerf([base], kerf)
+    return base
+
+
+# Get the SVG code of the text and logo engraved on the base at its
+# current position. logo_file can be None to skip the logo. With
+# outline_text set the text is written as cut-ready glyph outlines.
+def decorate_base(base, logo_file="logo.svg", outline_text=False):
+    base_x, base_y = base.get_center()
+    text = base.generate_text("Digital Manufacturing", (base_x, base_y), 0, outline=outline_text)
+    logo = ""
+    if logo_file is not None:
+        logo = base.embed_logo((base_x, base_y - base.get_length()/4), 0.05, logo_file)
+    return text, logo
+
+
+# Build every part of the desk organizer and return them in the order
+# they are written to the SVG document. When a sheet size is given the
+# parts are nested onto a sheet of that size instead of the fixed layout.
+def build_desk_organizer(length=100, width=50, shelf_area=175, num_shelves=2, kerf=0.2, num_junctions=2, screw_length=8.5, nut_width=4.5, sheet_thickness=3, nut_thickness=1.5, base_area=250, slot_length=5, screw_diameter=2.1, starting_point=(20, 20), logo_file="logo.svg", sheet_width=None, sheet_height=None, spacing=2, outline_text=False):
+    check_dimensions(length, width, shelf_area, num_shelves)
+    hardware = (screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter)
+    tower = build_tower(length, width, num_shelves, num_junctions, *hardware, starting_point=starting_point, kerf=kerf)
+    shelves = build_shelves(length, width, shelf_area, *hardware, starting_point=starting_point, kerf=kerf)
+    base = build_base(length, width, base_area, kerf, *hardware, starting_point=starting_point)
+    nest_on_sheet([tower] + shelves + [base], sheet_width, sheet_height, spacing)
+    text, logo = decorate_base(base, logo_file, outline_text)
+    return [tower, text, logo] + shelves + [base]
+
+
+# Check the main dimensions of a desk organizer
+def check_dimensions(length, width, shelf_area, num_shelves):
+    if length <= 0:
+        raise ValueError("Height must be greater than 0.")
+    if width <= 0:
+        raise ValueError("Width must be greater than 0.")
+    if shelf_area <= 0:
+        raise ValueError("Shelf area must be greater than 0.")
+    if num_shelves <= 0:
+        raise ValueError("Number of shelves must be greater than 0.")
+
+
+# Nest parts onto one sheet of the given size, or leave them where they
+# are when no sheet size is given
+def nest_on_sheet(parts, sheet_width=None, sheet_height=None, spacing=2):
+    if sheet_width is None and sheet_height is None:
+        return
+    if sheet_width is None or sheet_height is None:
+        raise ValueError("Both sheet_width and sheet_height must be given to nest the parts.")
+    result = nesting.nest(parts, sheet_width, sheet_height, spacing)
+    if len(result.sheets) > 1:
+        raise ValueError(f"The parts do not fit on one {sheet_width} x {sheet_height} sheet.")
+
+if __name__ == '__main__':
+    import json
+    import os
+    import sys
+
+    # profiling instruments the module named component, so make that this
+    # script instead of a second copy of it. It is only imported when
+    # ORGANIZER_PROFILE asks for it.
+    profiling = None
+    if os.environ.get('ORGANIZER_PROFILE', '') not in ('', '0'):
+        sys.modules.setdefault('component', sys.modules[__name__])
+        import profiling
 
     while True:
         try:
@@ -514,81 +1545,24 @@ if __name__ == '__main__':
         except ValueError as e:
             print(f"Error: {e}")
 
-    # Define the parameters for the desk organizer
-    kerf = 0.2
-    num_junctions = 2
-    screw_length = 8.5
-    nut_width = 4.5
-    sheet_thickness = 3 
-    nut_thickness = 1.5
-    base_area = 250
-    font_size = 0.25
-    slot_length = 5 
-    screw_diameter = 2.1 - kerf
-
-    
     # Convert the input to the correct data type or use the default value if no input is provided
     length = int(length) if length else 100
     width = int(width) if width else 50
     num_shelves = int(num_shelves) if num_shelves else 2
     shelf_area = int(shelf_area) if shelf_area else 175
 
-    # Create the starting point for the rectangular shelf
-    starting_point = (20, 20)
-
-    # Generate Rectangular Tower Piece
-    tower_shape = Shape()
-    tower_shape.set_points(Shape().generate_rectangle_tower(length, width,'plain slot', num_junctions, starting_point, 0, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter))
-    desk_organizer = Component()
-    desk_organizer.add_shape(tower_shape, starting_point, True)
-    c = (nut_width - screw_diameter) / 2
-    c1 = 6*c
-    junction_length = slot_length + c1 + screw_diameter + c1 + slot_length
-    tower_x = tower_shape.get_x() - (c1 + screw_diameter/2)
-    tower_y = starting_point[1]
-    shelf_height = length / (num_shelves + 1)
-    for i in range(num_shelves):
-        tower_y += shelf_height
-        desk_organizer.generate_junction_holes((tower_x, tower_y), 0, screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter)
-    components = []
-
-    # Generate Shelves
-    starting_points = [(starting_point[0]+(width*2), starting_point[1]),
-                    (starting_point[0]+(width*2), starting_point[1]+(length*0.6)),
-                    (starting_point[0]+(width*3.5), starting_point[1]),
-                    (starting_point[0]+(width*3.5), starting_point[1])]
-
-    num_sides = [6, 4, 3]
-
-    for i in range(len(num_sides)-1):
-        new_starting_point = starting_points[i]
-        shelf_shape = Shape()
-        shelf_shape.set_points(shelf_shape.generate_polygon_with_junctions(num_sides[i],'captive joint slot', 1, shelf_area/num_sides[i], new_starting_point))
-        shelf = Component()
-        shelf.add_shape(shelf_shape, new_starting_point, True)
-        components.append(shelf)
-    
-    # Generate Base Piece
-    shelf_shape = Shape()
-    shelf_shape.set_points(shelf_shape.generate_polygon(7, base_area/7, starting_points[3]))
-    shelf = Component()
-    shelf.add_shape(shelf_shape, new_starting_point, True)
-    shelf.generate_junction_holes((shelf_shape.get_x() - (c1 - screw_diameter/2 + slot_length), shelf_shape.get_y()), 0, screw_length, nut_width, sheet_thickness - kerf, nut_thickness, slot_length - kerf, screw_diameter, False)
-    text = shelf.generate_text("Digital Manufacturing", (shelf_shape.get_x(), shelf_shape.get_y()), 0)
-    logo = shelf.embed_logo((shelf_shape.get_x(), shelf_shape.get_y() - shelf.get_length()/4), 0.05)
-    components.append(shelf)
-
-
-    # Add header to the SVG code
-    svg_width = str(500)
-    svg_height = str(500)
+    # Generate the tower, shelves, base, text and logo nested onto the sheet
+    svg_width = 500
+    svg_height = 500
     scaling_factor = 1
-    svg_header = '<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n<!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 1.1//EN"\n"http://www.w3.org/Graphics/SVG/1.1/DTD/svg11.dtd">\n\n<svg width="{0}" height="{1}"\nxmlns="http://www.w3.org/2000/svg">\n\n'.format(svg_width * scaling_factor, svg_height * scaling_factor)    
-    svg_code = svg_header + desk_organizer.to_svg("") + text + logo 
-    for c in components:
-        svg_code += c.to_svg("")
-    svg_code += "</svg>"
+    parts = build_desk_organizer(length, width, shelf_area, num_shelves, sheet_width=svg_width, sheet_height=svg_height)
 
     # Save the SVG code to a file
     with open('desk_organizer.svg', 'w') as file:
-        file.write(svg_code)
+        write_svg_document(file, parts, svg_width, svg_height, scaling_factor)
+
+    # Save the profile of the build next to it
+    if profiling is not None and profiling.enabled():
+        with open('desk_organizer.profile.json', 'w') as file:
+            json.dump(profiling.disable().report(), file, indent=2)
+        print("Profile written to desk_organizer.profile.json")
@@ -0,0 +1,305 @@
+import math
+import time
+
+import svgpath
+
+# Cut planning orders the outlines of parts so the laser head travels as
+# little as possible between cuts. Inner holes, slots and child
+# components of a part are cut before the part's own outline, so the
+# part does not drop out of the sheet before its holes are cut. Parts and
+# the loops inside each part are ordered by a nearest-neighbour tour
+# improved with 2-opt, and every closed loop starts at the vertex closest
+# to where the head is.
+
+
+# A loop to cut: its points, rotated so the cut starts at the first one,
+# whether the loop is closed (a polygon) or open (a fractal polyline),
+# and the ((x, y), radius) of the circle it traces, if any
+class CutLoop:
+    def __init__(self, points, closed=True, circle=None):
+        self.points = points
+        self.closed = closed
+        self.circle = circle
+
+    # Get the point the cut starts at
+    def get_start(self):
+        return self.points[0]
+
+    # Get the point the head is at after cutting the loop
+    def get_end(self):
+        return self.points[0] if self.closed else self.points[-1]
+
+    # Yield the SVG code of the loop in chunks. With curves set, circles
+    # are written as two arcs that start and end at the start point. With
+    # precision set, loops are written as compact paths that keep the
+    # planned start point.
+    def iter_svg(self, scaling_factor=1, curves=False, precision=None):
+        if curves and self.circle is not None:
+            (cx, cy), radius = self.circle
+            x, y = self.points[0]
+            if precision is None:
+                number = str
+            else:
+                number = lambda value: svgpath.format_number(value, precision)
+            r = number(radius * scaling_factor)
+            start = f'{number(x * scaling_factor)},{number(y * scaling_factor)}'
+            end = f'{number((2 * cx - x) * scaling_factor)},{number((2 * cy - y) * scaling_factor)}'
+            yield f'\n  <path d="M {start} A {r},{r} 0 1,0 {end} A {r},{r} 0 1,0 {start} Z" {svgpath.PATH_STYLE}/>\n'
+            return
+        if precision is not None:
+            yield svgpath.svg_path(self.points, precision, scaling_factor, self.closed)
+            return
+        yield '\n  <polygon points="' if self.closed else '<polyline points="'
+        yield ' '.join(str(x * scaling_factor) + ',' + str(y * scaling_factor) for x, y in self.points)
+        yield '" style="fill:none;stroke:black;stroke-width:1"/>\n'
+
+
+# The loops of a set of parts in cutting order, with the travel distance
+# of the head between cuts in the original order and in the planned one
+class CutPlan:
+    def __init__(self, loops, travel_before, travel_after, seconds):
+        self.loops = loops
+        self.travel_before = travel_before
+        self.travel_after = travel_after
+        self.seconds = seconds
+
+    # Yield the SVG code of all the loops in cutting order
+    def iter_svg(self, scaling_factor=1, curves=False, precision=None):
+        for loop in self.loops:
+            yield from loop.iter_svg(scaling_factor, curves, precision)
+
+    # Write the SVG code of all the loops in cutting order to a file-like object
+    def write_svg(self, file, scaling_factor=1, curves=False, precision=None):
+        file.writelines(self.iter_svg(scaling_factor, curves, precision))
+
+    # Summarize the plan as a dictionary
+    def report(self):
+        saved = self.travel_before - self.travel_after
+        return {
+            'num_loops': len(self.loops),
+            'travel_before': self.travel_before,
+            'travel_after': self.travel_after,
+            'travel_saved': saved,
+            'travel_saved_fraction': saved / self.travel_before if self.travel_before else 0.0,
+            'seconds': self.seconds,
+        }
+
+
+def _distance(a, b):
+    return math.hypot(a[0] - b[0], a[1] - b[1])
+
+
+def _centroid(points):
+    return (sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points))
+
+
+# Get the points of a shape without a repeated closing point
+def _ring(points):
+    points = list(points)
+    if len(points) > 1 and points[0] == points[-1]:
+        points.pop()
+    return points
+
+
+# A unit the planner orders: a single loop, or a part whose children
+# are planned first and whose outline is cut last
+class _Unit:
+    def __init__(self, points=None, closed=True, children=None, outline=None, circle=None):
+        self.points = points
+        self.closed = closed
+        self.circle = circle
+        self.children = children
+        self.outline = outline
+        self.center = _centroid(outline if outline is not None else points)
+
+
+# Break a Shape or Component down into units
+def _unit(part):
+    if not hasattr(part, 'get_mother_shape'):
+        return _Unit(points=list(part.get_points()), circle=part.circle)
+    children = [_Unit(points=list(shape.get_points()), circle=shape.circle) for shape in part.get_placed_shapes()]
+    children += [_unit(component) for component in part.get_placed_components()]
+    fractal = part.get_placed_fractal()
+    if fractal:
+        children.append(_Unit(points=list(fractal), closed=False))
+    return _Unit(children=children, outline=list(part.get_mother_shape().get_points()))
+
+
+# Get the loops of a part in the order Component.to_svg writes them:
+# mother shape, shapes, child components, fractal
+def _loops_in_svg_order(part):
+    if not hasattr(part, 'get_mother_shape'):
+        return [CutLoop(list(part.get_points()), circle=part.circle)]
+    loops = [CutLoop(list(part.get_mother_shape().get_points()))]
+    loops += [CutLoop(list(shape.get_points()), circle=shape.circle) for shape in part.get_placed_shapes()]
+    for component in part.get_placed_components():
+        loops += _loops_in_svg_order(component)
+    if part.data['fractal']:
+        loops.append(CutLoop(list(part.get_placed_fractal()), closed=False))
+    return loops
+
+
+# Get the distance the head travels between cutting the loops in order
+def travel_distance(loops, start=(0, 0)):
+    head = start
+    total = 0.0
+    for loop in loops:
+        total += _distance(head, loop.get_start())
+        head = loop.get_end()
+    return total
+
+
+# A uniform grid over points for nearest neighbour queries
+class _PointGrid:
+    def __init__(self, points):
+        self.points = points
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        self.min_x = min(xs)
+        self.min_y = min(ys)
+        width = max(xs) - self.min_x
+        height = max(ys) - self.min_y
+        # Aim for a few points per cell, also when the points are collinear
+        if width > 0 and height > 0:
+            self.cell = math.sqrt(width * height / len(points)) * 2
+        else:
+            self.cell = max(width, height) / len(points) * 2 or 1.0
+        self.columns = int(width // self.cell)
+        self.rows = int(height // self.cell)
+        self.cells = {}
+        for i, p in enumerate(points):
+            self.cells.setdefault(self.__key(p), set()).add(i)
+
+    def __key(self, p):
+        return (int((p[0] - self.min_x) // self.cell), int((p[1] - self.min_y) // self.cell))
+
+    def remove(self, i):
+        self.cells[self.__key(self.points[i])].discard(i)
+
+    # Get the indexes of the k nearest points to p, nearest first
+    def nearest(self, p, k=1, exclude=None):
+        cx, cy = self.__key(p)
+        found = []
+        # Start at the first ring that reaches the grid and stop at the
+        # ring that covers all of it
+        ring = max(-cx, cx - self.columns, -cy, cy - self.rows, 0)
+        last = max(cx, self.columns - cx, cy, self.rows - cy)
+        while ring <= last:
+            for i in range(max(cx - ring, 0), min(cx + ring, self.columns) + 1):
+                step = 1 if abs(i - cx) == ring else 2 * ring
+                for j in range(cy - ring, cy + ring + 1, max(step, 1)):
+                    for index in self.cells.get((i, j), ()):
+                        if index != exclude:
+                            found.append((_distance(p, self.points[index]), index))
+            # Points in rings further out are at least ring * cell away
+            if len(found) >= k:
+                found.sort()
+                if found[k - 1][0] <= ring * self.cell:
+                    break
+            ring += 1
+        found.sort()
+        return [index for _, index in found[:k]]
+
+
+# Order points into a path from start: nearest neighbour first, then
+# improved with 2-opt moves restricted to the closest neighbours of each
+# point, until no move helps or the deadline passes
+def order_points(points, start, deadline=None, neighbors=8):
+    n = len(points)
+    if n <= 1:
+        return list(range(n))
+    grid = _PointGrid(points)
+    order = []
+    head = start
+    for _ in range(n):
+        index = grid.nearest(head)[0]
+        grid.remove(index)
+        order.append(index)
+        head = points[index]
+    if n < 4:
+        return order
+
+    grid = _PointGrid(points)
+    candidates = [grid.nearest(p, neighbors + 1, exclude=i)[:neighbors] for i, p in enumerate(points)]
+    position = [0] * n
+    for i, index in enumerate(order):
+        position[index] = i
+
+    def point(i):
+        return start if i < 0 else points[order[i]]
+
+    improved = True
+    while improved and (deadline is None or time.perf_counter() < deadline):
+        improved = False
+        for i in range(n):
+            # Try replacing the edge into position i by an edge from the
+            # point before it to one of its close neighbours at position j,
+            # reversing the path between them
+            before = point(i - 1)
+            first = points[order[i]]
+            removed = _distance(before, first)
+            anchor = order[i - 1] if i > 0 else None
+            near = candidates[anchor] if anchor is not None else grid.nearest(start, neighbors)
+            for other in near:
+                j = position[other]
+                if j <= i:
+                    continue
+                last = points[order[j]]
+                after = points[order[j + 1]] if j + 1 < n else None
+                delta = _distance(before, last) - removed
+                if after is not None:
+                    delta += _distance(first, after) - _distance(last, after)
+                if delta < -1e-9:
+                    order[i:j + 1] = order[i:j + 1][::-1]
+                    for k in range(i, j + 1):
+                        position[order[k]] = k
+                    improved = True
+                    break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+    return order
+
+
+# Rotate a closed loop to start at the vertex closest to the head, or
+# reverse an open path if its far end is closer
+def _start_loop(points, closed, head, circle=None):
+    if not closed:
+        if _distance(head, points[-1]) < _distance(head, points[0]):
+            points = points[::-1]
+        return CutLoop(points, False)
+    repeated = len(points) > 1 and points[0] == points[-1]
+    ring = _ring(points)
+    best = min(range(len(ring)), key=lambda i: _distance(head, ring[i]))
+    ring = ring[best:] + ring[:best]
+    if repeated:
+        ring.append(ring[0])
+    return CutLoop(ring, True, circle)
+
+
+# Plan units in travel order from head, appending their loops to loops,
+# and return where the head ends up
+def _plan_units(units, head, loops, deadline):
+    order = order_points([unit.center for unit in units], head, deadline)
+    for index in order:
+        unit = units[index]
+        if unit.children is not None:
+            head = _plan_units(unit.children, head, loops, deadline)
+            loop = _start_loop(unit.outline, True, head)
+        else:
+            loop = _start_loop(unit.points, unit.closed, head, unit.circle)
+        loops.append(loop)
+        head = loop.get_end()
+    return head
+
+
+# Plan the cutting order of parts (Components or Shapes; rendered SVG
+# strings such as text and logo are skipped). The head starts at start.
+# time_limit bounds the 2-opt improvement in seconds.
+def plan_cuts(parts, start=(0, 0), time_limit=0.5):
+    begin = time.perf_counter()
+    parts = [part for part in parts if not isinstance(part, str)]
+    original = [loop for part in parts for loop in _loops_in_svg_order(part)]
+    loops = []
+    if parts:
+        _plan_units([_unit(part) for part in parts], start, loops, begin + time_limit)
+    return CutPlan(loops, travel_distance(original, start), travel_distance(loops, start), time.perf_counter() - begin)
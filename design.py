@@ -0,0 +1,220 @@
+import inspect
+from collections import OrderedDict
+
+import assets
+from component import Component, build_base, build_desk_organizer, build_shelves, build_tower, check_dimensions, \
+    decorate_base, nest_on_sheet, svg_header
+
+# A design is a graph of part builders. Each node names the parameters
+# and the other nodes it depends on, and its results are memoized by the
+# values of those parameters and the keys of those nodes. Changing one
+# parameter therefore only rebuilds the nodes that depend on it, and
+# going back to an earlier value is a cache hit.
+
+
+# A builder in a design graph. build is called with the node's
+# parameters and the results of the nodes it depends on as keyword
+# arguments.
+class Node:
+    def __init__(self, name, build, params=(), deps=()):
+        self.name = name
+        self.build = build
+        self.params = tuple(params)
+        self.deps = tuple(deps)
+
+
+# A graph of nodes with a bounded memo of their results
+class Design:
+    def __init__(self, nodes, max_entries=256):
+        self.nodes = OrderedDict((node.name, node) for node in nodes)
+        for node in nodes:
+            for dep in node.deps:
+                if dep not in self.nodes:
+                    raise ValueError(f"Node {node.name} depends on unknown node {dep}")
+        self.max_entries = max_entries
+        self.memo = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # The nodes built by the last call to evaluate
+        self.rebuilt = []
+
+    # Get the key a node's result is memoized under for the parameters
+    def key(self, name, params, keys=None):
+        if keys is not None and name in keys:
+            return keys[name]
+        node = self.nodes[name]
+        key = (name, tuple(params[p] for p in node.params), tuple(self.key(dep, params, keys) for dep in node.deps))
+        if keys is not None:
+            keys[name] = key
+        return key
+
+    # Evaluate a node for the parameters, building it and the nodes it
+    # depends on only when their memoized results are missing
+    def evaluate(self, name, params):
+        self.rebuilt = []
+        return self.__evaluate(name, params, {})
+
+    def __evaluate(self, name, params, keys):
+        key = self.key(name, params, keys)
+        if key in self.memo:
+            self.hits += 1
+            self.memo.move_to_end(key)
+            return self.memo[key]
+        self.misses += 1
+        node = self.nodes[name]
+        kwargs = {p: params[p] for p in node.params}
+        for dep in node.deps:
+            kwargs[dep] = self.__evaluate(dep, params, keys)
+        value = node.build(**kwargs)
+        self.rebuilt.append(name)
+        self.memo[key] = value
+        if len(self.memo) > self.max_entries:
+            self.memo.popitem(last=False)
+        return value
+
+    # Return the memo hit/miss counters as a dictionary
+    def cache_stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': len(self.memo),
+        }
+
+    # Drop every memoized result
+    def clear(self):
+        self.memo.clear()
+
+
+# The parameters of the desk organizer and their defaults, taken from
+# build_desk_organizer
+ORGANIZER_DEFAULTS = {name: parameter.default
+                      for name, parameter in inspect.signature(build_desk_organizer).parameters.items()}
+
+HARDWARE = ('screw_length', 'nut_width', 'sheet_thickness', 'nut_thickness', 'slot_length', 'screw_diameter')
+
+
+def _hardware(screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter):
+    return (screw_length, nut_width, sheet_thickness, nut_thickness, slot_length, screw_diameter)
+
+
+def _tower(length, width, num_shelves, num_junctions, kerf, starting_point, hardware):
+    return build_tower(length, width, num_shelves, num_junctions, *hardware, starting_point=starting_point, kerf=kerf)
+
+
+def _shelves(length, width, shelf_area, kerf, starting_point, hardware):
+    return build_shelves(length, width, shelf_area, *hardware, starting_point=starting_point, kerf=kerf)
+
+
+def _base(length, width, base_area, kerf, starting_point, hardware):
+    return build_base(length, width, base_area, kerf, *hardware, starting_point=starting_point)
+
+
+# The built parts are memoized and shared, so the layout moves views
+# of them and leaves the memoized parts where they were built
+def _layout(sheet_width, sheet_height, spacing, tower, shelves, base):
+    parts = [tower.view()] + [shelf.view() for shelf in shelves] + [base.view()]
+    nest_on_sheet(parts, sheet_width, sheet_height, spacing)
+    return parts
+
+
+# logo_version is only part of the memo key, so a changed logo file is
+# embedded again
+def _decoration(logo_file, logo_version, outline_text, layout):
+    return decorate_base(layout[-1], logo_file, outline_text)
+
+
+def _parts(layout, decoration):
+    text, logo = decoration
+    return [layout[0], text, logo] + layout[1:-1] + [layout[-1]]
+
+
+# The desk organizer as a design graph. evaluate('parts', params) gives
+# the same parts as build_desk_organizer(**params), and the rendered
+# SVG of every placed part is memoized as well.
+class OrganizerDesign(Design):
+    def __init__(self, max_entries=256, max_fragments=1024):
+        super().__init__([
+            Node('hardware', _hardware, HARDWARE),
+            Node('tower', _tower, ('length', 'width', 'num_shelves', 'num_junctions', 'kerf', 'starting_point'), ('hardware',)),
+            Node('shelves', _shelves, ('length', 'width', 'shelf_area', 'kerf', 'starting_point'), ('hardware',)),
+            Node('base', _base, ('length', 'width', 'base_area', 'kerf', 'starting_point'), ('hardware',)),
+            Node('layout', _layout, ('sheet_width', 'sheet_height', 'spacing'), ('tower', 'shelves', 'base')),
+            Node('decoration', _decoration, ('logo_file', 'logo_version', 'outline_text'), ('layout',)),
+            Node('parts', _parts, (), ('layout', 'decoration')),
+        ], max_entries)
+        self.max_fragments = max_fragments
+        self.fragments = OrderedDict()
+        self.fragment_hits = 0
+        self.fragment_misses = 0
+
+    # Get the full parameters: the defaults updated with the given ones,
+    # and the version of the logo file (see assets.asset_version)
+    def parameters(self, params):
+        unknown = set(params) - set(ORGANIZER_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown parameter: {sorted(unknown)[0]}")
+        full = dict(ORGANIZER_DEFAULTS)
+        full.update(params)
+        full['logo_version'] = assets.asset_version(full['logo_file'])
+        return full
+
+    # Build the parts of the organizer, like build_desk_organizer. The
+    # returned components are shared with the memo and must not be
+    # changed; move views of them instead.
+    def build(self, **params):
+        params = self.parameters(params)
+        check_dimensions(params['length'], params['width'], params['shelf_area'], params['num_shelves'])
+        return self.evaluate('parts', params)
+
+    # Get the SVG code of a part. Components are memoized by the part
+    # they are a view of and where they are placed.
+    def render_part(self, part, scaling_factor=1, curves=False, precision=None):
+        if isinstance(part, str):
+            return part
+        if not isinstance(part, Component):
+            return ''.join(part.iter_svg(scaling_factor, curves, precision))
+        key = (id(part.data), part.transform, scaling_factor, curves, precision)
+        fragment = self.fragments.get(key)
+        if fragment is not None and fragment[0] is part.data:
+            self.fragment_hits += 1
+            self.fragments.move_to_end(key)
+            return fragment[1]
+        self.fragment_misses += 1
+        svg = ''.join(part.iter_svg(scaling_factor, curves, precision))
+        # The data is kept with the fragment so its id is not reused
+        self.fragments[key] = (part.data, svg)
+        if len(self.fragments) > self.max_fragments:
+            self.fragments.popitem(last=False)
+        return svg
+
+    # Yield the SVG document of the organizer for the parameters, reusing
+    # the rendered parts that did not change. With symbols set the logo
+    # is written once as a <symbol>, like write_svg_document.
+    def iter_document(self, params, width=500, height=500, scaling_factor=1, curves=False, precision=None, symbols=False):
+        parts = self.build(**params)
+        yield svg_header(width, height, scaling_factor, xlink=symbols)
+        if symbols:
+            defs, parts = assets.logo_symbols(parts)
+            yield defs
+        for part in parts:
+            yield self.render_part(part, scaling_factor, curves, precision)
+        yield "</svg>"
+
+    # Write the SVG document of the organizer to a file-like object
+    def write_document(self, file, params, width=500, height=500, scaling_factor=1, curves=False, precision=None,
+                       symbols=False):
+        file.writelines(self.iter_document(params, width, height, scaling_factor, curves, precision, symbols))
+
+    # Return the memo and fragment hit/miss counters as a dictionary
+    def cache_stats(self):
+        stats = super().cache_stats()
+        stats['fragment_hits'] = self.fragment_hits
+        stats['fragment_misses'] = self.fragment_misses
+        return stats
+
+    # Drop every memoized result and rendered part
+    def clear(self):
+        super().clear()
+        self.fragments.clear()
@@ -0,0 +1,161 @@
+# Font handling for text rendering. matplotlib is only imported the
+# first time font metrics are actually needed, so importing Shape or
+# Component does not pay for it.
+
+import svgpath
+
+_font_manager = None
+_ft2font = None
+
+# Glyph outlines by (font file, size) and character. Fonts are only
+# loaded and glyphs only traced the first time they are used at a size.
+# Glyphs are traced at REFERENCE_SIZE and scaled to the size, since
+# FreeType gives outline points on a 1/64 point grid, which would show
+# as wobbly curves at the small sizes labels use.
+_glyphs = {}
+
+# Decimals glyph outlines are written with
+GLYPH_PRECISION = 3
+
+# Size fonts are measured at before scaling to the requested size, large
+# enough that hinting does not round the advance widths
+REFERENCE_SIZE = 100
+
+
+# Return matplotlib.font_manager, importing it on first use
+def get_font_manager():
+    global _font_manager
+    if _font_manager is None:
+        import matplotlib.font_manager as fm
+        _font_manager = fm
+    return _font_manager
+
+
+# Return matplotlib.ft2font, importing it on first use
+def get_ft2font():
+    global _ft2font
+    if _ft2font is None:
+        get_font_manager()
+        import matplotlib.ft2font as ft2font
+        _ft2font = ft2font
+    return _ft2font
+
+
+# Report whether the font subsystem has been initialized
+def fonts_loaded():
+    return _font_manager is not None
+
+
+# Find the path of the font file matplotlib uses for a family
+def find_font(family='sans-serif'):
+    fm = get_font_manager()
+    return fm.findfont(fm.FontProperties(family=[family]))
+
+
+# Get the width of a line of text at the given font size, measured
+# from the advance widths of the font. Falls back to the average glyph
+# width estimate when matplotlib is not installed.
+def text_width(text, font_size, family='sans-serif'):
+    try:
+        fm = get_font_manager()
+    except ImportError:
+        return len(text) * font_size / 2.35
+    font = fm.get_font(find_font(family))
+    font.set_size(REFERENCE_SIZE, 72)
+    font.set_text(text, 0.0)
+    width, _ = font.get_width_height()
+    return width / 64 * font_size / REFERENCE_SIZE
+
+
+# A glyph of a font at a size: its index in the font, its unhinted
+# advance width and its outline as SVG path data, with the origin on the
+# baseline and y pointing down
+class Glyph:
+    def __init__(self, index, advance, path):
+        self.index = index
+        self.advance = advance
+        self.path = path
+
+
+# Get the SVG path data of a FreeType outline given as matplotlib path
+# vertices and codes (1 move, 2 line, 3 quadratic, 4 cubic, 79 close),
+# with the vertices multiplied by scale
+def outline_path(vertices, codes, scale=1):
+    commands = {1: 'M', 2: 'L', 3: 'Q', 4: 'C'}
+    parts = []
+    i = 0
+    while i < len(codes):
+        code = codes[i]
+        if code == 79:
+            parts.append('Z')
+            i += 1
+            continue
+        # A quadratic curve takes two vertices and a cubic one three
+        count = {3: 2, 4: 3}.get(code, 1)
+        parts.append(commands[code])
+        for x, y in vertices[i:i + count]:
+            parts.append(svgpath.format_number(x * scale, GLYPH_PRECISION))
+            parts.append(svgpath.format_number(-y * scale, GLYPH_PRECISION))
+        i += count
+    return ' '.join(parts)
+
+
+# Get the FreeType font of a font file set to a size in points
+def _sized_font(font_file, size):
+    font = get_font_manager().get_font(font_file)
+    font.set_size(size, 72)
+    return font
+
+
+# Get a glyph of a font file at a size, tracing its outline at
+# REFERENCE_SIZE and scaling it to the size on first use
+def get_glyph(font_file, size, char):
+    glyphs = _glyphs.setdefault((font_file, size), {})
+    glyph = glyphs.get(char)
+    if glyph is None:
+        ft2font = get_ft2font()
+        no_hinting = ft2font.LoadFlags.NO_HINTING if hasattr(ft2font, 'LoadFlags') else ft2font.LOAD_NO_HINTING
+        font = _sized_font(font_file, REFERENCE_SIZE)
+        loaded = font.load_char(ord(char), flags=no_hinting)
+        vertices, codes = font.get_path()
+        scale = size / REFERENCE_SIZE
+        glyph = glyphs[char] = Glyph(font.get_char_index(ord(char)), loaded.linearHoriAdvance / 65536 * scale,
+                                     outline_path(vertices, codes, scale))
+    return glyph
+
+
+# Lay out a line of text: return its width and the (x, glyph) pairs of
+# its characters. The line is laid out with kerning at REFERENCE_SIZE and
+# scaled to the font size, like text_width, so it is exactly as wide as
+# text_width says; at small sizes the kerning would otherwise be rounded
+# to nothing. Raises ImportError when matplotlib is not installed.
+def layout_text(text, font_size, family='sans-serif'):
+    if font_size <= 0:
+        return 0.0, []
+    font_file = find_font(family)
+    font = _sized_font(font_file, REFERENCE_SIZE)
+    positions = font.set_text(text, 0.0)
+    width, _ = font.get_width_height()
+    # Positions and width are in 1/64 points at REFERENCE_SIZE
+    scale = font_size / REFERENCE_SIZE / 64
+    placed = [(float(position[0]) * scale, get_glyph(font_file, font_size, char))
+              for char, position in zip(text, positions)]
+    return width * scale, placed
+
+
+# Get the SVG code of laid out glyphs as outline paths, with the start
+# of the baseline at (x, y) and rotated by direction degrees around it
+def outline_svg(placed, x, y, direction=0):
+    code = [f'<g transform="rotate({direction}, {x}, {y}) translate({x}, {y})">\n']
+    for offset, glyph in placed:
+        if not glyph.path:
+            continue
+        transform = f'transform="translate({svgpath.format_number(offset, GLYPH_PRECISION)})" ' if offset else ''
+        code.append(f'<path {transform}d="{glyph.path}" {svgpath.PATH_STYLE}/>\n')
+    code.append('</g>\n')
+    return ''.join(code)
+
+
+# Drop every cached glyph
+def clear_glyphs():
+    _glyphs.clear()
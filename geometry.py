@@ -0,0 +1,400 @@
+import itertools
+import math
+
+# numpy is optional, it speeds up offsetting many polygons at once and
+# backs the array-backed shapes of component. It is only imported the
+# first time one of them needs it (see get_numpy), so importing geometry
+# or component does not pay for it.
+_numpy = None
+_numpy_missing = False
+
+# Polygon predicates and a grid spatial index used for collision checks,
+# the affine transforms components are placed with and polygon offsetting.
+# Polygons are lists of (x, y) tuples and are treated as closed; a
+# repeated closing point is allowed. Touching boundaries do not count
+# as an overlap.
+
+EPSILON = 1e-9
+
+
+# Get the cross product of (b - a) and (c - a): positive when a, b, c
+# turn counter-clockwise (in y-up coordinates), zero when collinear
+def orientation(a, b, c):
+    return (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+
+
+# Check whether segments p1-p2 and q1-q2 cross at a single point that
+# is interior to both of them
+def segments_cross(p1, p2, q1, q2):
+    d1 = orientation(q1, q2, p1)
+    d2 = orientation(q1, q2, p2)
+    d3 = orientation(p1, p2, q1)
+    d4 = orientation(p1, p2, q2)
+    return ((d1 > EPSILON and d2 < -EPSILON) or (d1 < -EPSILON and d2 > EPSILON)) and \
+           ((d3 > EPSILON and d4 < -EPSILON) or (d3 < -EPSILON and d4 > EPSILON))
+
+
+# Check whether point lies on the segment a-b
+def on_segment(point, a, b):
+    return abs(orientation(a, b, point)) <= EPSILON and \
+        min(a[0], b[0]) - EPSILON <= point[0] <= max(a[0], b[0]) + EPSILON and \
+        min(a[1], b[1]) - EPSILON <= point[1] <= max(a[1], b[1]) + EPSILON
+
+
+# Check whether segments p1-p2 and q1-q2 have any point in common,
+# including touching ends and collinear overlaps
+def segments_intersect(p1, p2, q1, q2):
+    if segments_cross(p1, p2, q1, q2):
+        return True
+    return on_segment(p1, q1, q2) or on_segment(p2, q1, q2) or on_segment(q1, p1, p2) or on_segment(q2, p1, p2)
+
+
+# Get the signed area of a closed polygon: positive when its points run
+# counter-clockwise in y-up coordinates (clockwise on an SVG canvas)
+def signed_area(points):
+    return sum(points[i - 1][0] * points[i][1] - points[i][0] * points[i - 1][1] for i in range(len(points))) / 2
+
+
+# Get the bounding box of a list of points as (min_x, min_y, max_x, max_y)
+def bounding_box(points):
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+# Check whether two bounding boxes overlap, touching counts as overlap
+def boxes_overlap(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+# Check whether bounding box a lies inside bounding box b
+def box_inside(a, b):
+    return a[0] >= b[0] and a[1] >= b[1] and a[2] <= b[2] and a[3] <= b[3]
+
+
+# Get the edges of a closed polygon as a list of point pairs
+def edges(points):
+    return [(points[i - 1], points[i]) for i in range(len(points)) if points[i - 1] != points[i]]
+
+
+# Check whether a point lies strictly inside a polygon (even-odd rule).
+# Points on the boundary count as outside.
+def point_in_polygon(point, points):
+    x, y = point
+    inside = False
+    for a, b in edges(points):
+        if abs(orientation(a, b, point)) <= EPSILON and \
+           min(a[0], b[0]) - EPSILON <= x <= max(a[0], b[0]) + EPSILON and \
+           min(a[1], b[1]) - EPSILON <= y <= max(a[1], b[1]) + EPSILON:
+            return False
+        if (a[1] > y) != (b[1] > y):
+            cross_x = a[0] + (y - a[1]) * (b[0] - a[0]) / (b[1] - a[1])
+            if x < cross_x:
+                inside = not inside
+    return inside
+
+
+# Check whether any edge of polygon a crosses an edge of polygon b
+def boundaries_cross(a, b):
+    b_edges = [(q1, q2, min(q1[0], q2[0]), max(q1[0], q2[0]), min(q1[1], q2[1]), max(q1[1], q2[1]))
+               for q1, q2 in edges(b)]
+    for p1, p2 in edges(a):
+        min_x, max_x = min(p1[0], p2[0]), max(p1[0], p2[0])
+        min_y, max_y = min(p1[1], p2[1]), max(p1[1], p2[1])
+        for q1, q2, q_min_x, q_max_x, q_min_y, q_max_y in b_edges:
+            if q_max_x < min_x or q_min_x > max_x or q_max_y < min_y or q_min_y > max_y:
+                continue
+            if segments_cross(p1, p2, q1, q2):
+                return True
+    return False
+
+
+# Check whether the interiors of two polygons overlap
+def polygons_overlap(a, b):
+    if not boxes_overlap(bounding_box(a), bounding_box(b)):
+        return False
+    if boundaries_cross(a, b):
+        return True
+    # Without crossings one polygon is inside the other or they are apart
+    if any(point_in_polygon(p, b) for p in a) or any(point_in_polygon(p, a) for p in b):
+        return True
+    # Identical outlines have every vertex on the other boundary
+    center = _centroid(a)
+    return point_in_polygon(center, a) and point_in_polygon(center, b)
+
+
+# Check whether polygon inner lies inside polygon outer. Touching the
+# boundary of outer is allowed.
+def polygon_inside(inner, outer):
+    if not box_inside(bounding_box(inner), bounding_box(outer)):
+        return False
+    if boundaries_cross(inner, outer):
+        return False
+    if any(point_in_polygon(p, outer) for p in inner):
+        return True
+    # Every vertex lies on the boundary of outer, so test the midpoints
+    return all(point_in_polygon(((a[0] + b[0]) / 2, (a[1] + b[1]) / 2), outer) or
+               _on_boundary(((a[0] + b[0]) / 2, (a[1] + b[1]) / 2), outer)
+               for a, b in edges(inner))
+
+
+def _on_boundary(point, points):
+    return any(on_segment(point, a, b) for a, b in edges(points))
+
+
+def _centroid(points):
+    return (sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points))
+
+
+# 2D affine transforms are (a, b, c, d, e, f) tuples as in SVG's
+# matrix(): a point (x, y) maps to (a*x + c*y + e, b*x + d*y + f).
+# None stands for the identity.
+
+# Get the transform that moves points by an offset
+def translation(offset_x, offset_y):
+    return (1.0, 0.0, 0.0, 1.0, offset_x, offset_y)
+
+
+# Get the transform that rotates points by an angle in degrees around origin
+def rotation(angle, origin=(0, 0)):
+    cos_a = math.cos(math.radians(angle))
+    sin_a = math.sin(math.radians(angle))
+    x, y = origin
+    return (cos_a, sin_a, -sin_a, cos_a, x - cos_a * x + sin_a * y, y - sin_a * x - cos_a * y)
+
+
+# Get the transform that applies inner first and then outer
+def compose(outer, inner):
+    if inner is None:
+        return outer
+    if outer is None:
+        return inner
+    a1, b1, c1, d1, e1, f1 = outer
+    a2, b2, c2, d2, e2, f2 = inner
+    return (a1 * a2 + c1 * b2, b1 * a2 + d1 * b2,
+            a1 * c2 + c1 * d2, b1 * c2 + d1 * d2,
+            a1 * e2 + c1 * f2 + e1, b1 * e2 + d1 * f2 + f1)
+
+
+# Apply a transform to a point
+def transform_point(matrix, point):
+    if matrix is None:
+        return point
+    a, b, c, d, e, f = matrix
+    x, y = point
+    return (a * x + c * y + e, b * x + d * y + f)
+
+
+# Return numpy, importing it on first use, or None when it is not
+# installed
+def get_numpy():
+    global _numpy, _numpy_missing
+    if _numpy is None and not _numpy_missing:
+        try:
+            import numpy
+        except ImportError:
+            _numpy_missing = True
+        else:
+            _numpy = numpy
+    return _numpy
+
+
+# Report whether numpy has been imported by get_numpy
+def numpy_loaded():
+    return _numpy is not None
+
+
+# Apply a transform to a list of points, or to an Nx2 numpy array
+def transform_points(matrix, points):
+    if matrix is None:
+        return points
+    a, b, c, d, e, f = matrix
+    if hasattr(points, 'ndim'):
+        return points @ ((a, b), (c, d)) + (e, f)
+    return [(a * x + c * y + e, b * x + d * y + f) for x, y in points]
+
+
+# Polygon offsetting for kerf compensation. A positive distance moves
+# every edge of a closed polygon outward, a negative one inward,
+# whatever the winding of its points. Corners are mitered: the new
+# vertex is where the moved edges meet. A corner whose miter would
+# reach further than MITER_LIMIT times the distance is beveled, so it
+# gets two vertices, one on each moved edge. Repeated points, including
+# a repeated closing point, are repeated in the output as well, so apart
+# from beveled corners the outline keeps its points.
+MITER_LIMIT = 4.0
+
+
+# Offset a list of polygons (lists of (x, y) tuples or Nx2 arrays) by a
+# distance each and return the new outlines as lists of (x, y) tuples,
+# or as Nx2 arrays with as_arrays set. With numpy every vertex of every
+# polygon is computed in one pass.
+def offset_polygons(polygons, distances, miter_limit=MITER_LIMIT, as_arrays=False):
+    np = get_numpy()
+    if np is None:
+        if as_arrays:
+            raise ImportError("numpy is required for array outlines")
+        return [_offset_polygon(list(points), distance, miter_limit) for points, distance in zip(polygons, distances)]
+    if not len(polygons):
+        return []
+    sizes = np.array([len(points) for points in polygons])
+    if any(hasattr(p, 'ndim') for p in polygons):
+        points = np.concatenate([np.asarray(p, dtype=np.float64).reshape(-1, 2) for p in polygons])
+    else:
+        coordinates = itertools.chain.from_iterable(itertools.chain.from_iterable(polygons))
+        points = np.fromiter(coordinates, np.float64, 2 * int(sizes.sum())).reshape(-1, 2)
+    count = len(points)
+    index = np.arange(count)
+    starts = np.cumsum(sizes) - sizes
+    ends = starts + sizes - 1
+    ring = np.repeat(np.arange(len(polygons)), sizes)
+
+    # Keep the first of every run of repeated points, and drop a last
+    # point on top of the first
+    step = np.hypot(*(points - points[index - 1]).T)
+    keep = step > EPSILON
+    keep[starts] = True
+    closing = (sizes > 1) & (np.hypot(*(points[ends] - points[starts]).T) <= EPSILON)
+    keep[ends[closing]] = False
+    owner = np.maximum.accumulate(np.where(keep, index, 0))
+    owner[ends[closing]] = starts[closing]
+    vertices = points[keep]
+    owner = (np.cumsum(keep) - 1)[owner]
+
+    # Neighbours of every vertex within its polygon
+    vertex_ring = ring[keep]
+    vertex_count = np.bincount(vertex_ring, minlength=len(polygons))
+    first = np.cumsum(vertex_count) - vertex_count
+    last = first + vertex_count - 1
+    following = np.arange(len(vertices)) + 1
+    following[last[vertex_count > 0]] = first[vertex_count > 0]
+    previous = np.arange(len(vertices)) - 1
+    previous[first[vertex_count > 0]] = last[vertex_count > 0]
+
+    # Outward unit normals of the edge out of and into every vertex
+    edge = vertices[following] - vertices
+    x, y = vertices.T
+    area = np.bincount(vertex_ring, x[previous] * y - x * y[previous], minlength=len(polygons))
+    sign = np.where(area < 0, -1.0, 1.0)[vertex_ring]
+    length = np.hypot(*edge.T)
+    scale = np.divide(sign, length, out=np.zeros_like(length), where=length > EPSILON)
+    normal = np.column_stack((edge[:, 1] * scale, -edge[:, 0] * scale))
+    normal_in = normal[previous]
+    edge_in = edge[previous]
+
+    distance = np.asarray(distances, dtype=np.float64)[vertex_ring]
+    denominator = 1 + np.einsum('ij,ij->i', normal_in, normal)
+    turn = edge_in[:, 0] * edge[:, 1] - edge_in[:, 1] * edge[:, 0]
+    # Corners that stick out in the direction of the offset get the
+    # long miters; the others are cut short by the moved edges
+    bulges = turn * sign * distance > 0
+    valid = (vertex_count >= 3)[vertex_ring]
+    bevel = valid & bulges & (denominator < 2 / miter_limit ** 2)
+    miter = np.divide(normal_in + normal, denominator[:, None], out=normal.copy(),
+                      where=denominator[:, None] > EPSILON)
+    moved = np.where(bevel[:, None], normal_in, miter)
+    offset = np.where(valid[:, None], vertices + distance[:, None] * moved, vertices)
+
+    result = offset[owner]
+    beveled = np.flatnonzero(bevel)
+    if len(beveled):
+        # The second vertex of a bevel goes after the last repeat of its
+        # corner, before a closing point
+        body = np.ones(count, dtype=bool)
+        body[ends[closing]] = False
+        last_repeat = np.zeros(len(vertices), dtype=np.int64)
+        np.maximum.at(last_repeat, owner[body], index[body])
+        result = np.insert(result, last_repeat[beveled] + 1,
+                           vertices[beveled] + distance[beveled, None] * normal[beveled], axis=0)
+        sizes = sizes + np.bincount(vertex_ring[beveled], minlength=len(polygons))
+    bounds = np.cumsum(sizes).tolist()
+    if as_arrays:
+        return [result[end - size:end] for end, size in zip(bounds, sizes.tolist())]
+    result = list(map(tuple, result.tolist()))
+    return [result[end - size:end] for end, size in zip(bounds, sizes.tolist())]
+
+
+# Offset one polygon given as a list of (x, y) tuples, the same way as
+# offset_polygons, without numpy
+def _offset_polygon(points, distance, miter_limit=MITER_LIMIT):
+    closing = len(points) > 1 and math.dist(points[0], points[-1]) <= EPSILON
+    body = points[:-1] if closing else points
+    vertices = []
+    owner = []
+    for point in body:
+        if not vertices or math.dist(vertices[-1], point) > EPSILON:
+            vertices.append(point)
+        owner.append(len(vertices) - 1)
+    n = len(vertices)
+    if n < 3:
+        return list(points)
+    sign = -1.0 if signed_area(vertices) < 0 else 1.0
+    normals = []
+    for i in range(n):
+        (x1, y1), (x2, y2) = vertices[i], vertices[(i + 1) % n]
+        length = math.hypot(x2 - x1, y2 - y1)
+        scale = sign / length if length > EPSILON else 0.0
+        normals.append(((y2 - y1) * scale, (x1 - x2) * scale, x2 - x1, y2 - y1))
+    corners = []
+    for i, (x, y) in enumerate(vertices):
+        in_x, in_y, edge_in_x, edge_in_y = normals[i - 1]
+        out_x, out_y, edge_x, edge_y = normals[i]
+        denominator = 1 + in_x * out_x + in_y * out_y
+        bulges = (edge_in_x * edge_y - edge_in_y * edge_x) * sign * distance > 0
+        if bulges and denominator < 2 / miter_limit ** 2:
+            corners.append([(x + distance * in_x, y + distance * in_y), (x + distance * out_x, y + distance * out_y)])
+        elif denominator > EPSILON:
+            corners.append([(x + distance * (in_x + out_x) / denominator, y + distance * (in_y + out_y) / denominator)])
+        else:
+            corners.append([(x + distance * out_x, y + distance * out_y)])
+    result = []
+    for i, vertex in enumerate(owner):
+        last_repeat = i + 1 == len(owner) or owner[i + 1] != vertex
+        result.extend(corners[vertex] if last_repeat else corners[vertex][:1])
+    if closing:
+        result.append(result[0])
+    return result
+
+
+# A uniform grid over bounding boxes. Items are stored in every cell
+# their box touches, so a query only looks at the items near the box.
+# The cell size is taken from the first item when not given; Component
+# sizes it from its children.
+class GridIndex:
+    def __init__(self, cell_size=None):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.boxes = {}
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __cells(self, box):
+        size = self.cell_size
+        for i in range(int(box[0] // size), int(box[2] // size) + 1):
+            for j in range(int(box[1] // size), int(box[3] // size) + 1):
+                yield (i, j)
+
+    # Add an item with its bounding box
+    def insert(self, item, box):
+        if self.cell_size is None:
+            self.cell_size = max(box[2] - box[0], box[3] - box[1], EPSILON) * 2
+        self.boxes[id(item)] = (item, box)
+        for cell in self.__cells(box):
+            self.cells.setdefault(cell, []).append(item)
+
+    # Get the items whose bounding box overlaps the given box
+    def query(self, box):
+        if self.cell_size is None:
+            return []
+        found = {}
+        for cell in self.__cells(box):
+            for item in self.cells.get(cell, ()):
+                if id(item) not in found and boxes_overlap(self.boxes[id(item)][1], box):
+                    found[id(item)] = item
+        return list(found.values())
+
+    # Remove every item
+    def clear(self):
+        self.cells.clear()
+        self.boxes.clear()
@@ -0,0 +1,203 @@
+import math
+
+# Nesting packs parts (Components or Shapes) onto laser sheets. Every
+# part is placed by its bounding box, trying each of the given rotation
+# angles, with the free space of a sheet tracked as a list of maximal
+# free rectangles. Parts are placed bottom-left first, so the used part
+# of the bed stays as small as possible.
+
+
+# A part placed on a sheet: the index of the sheet, the angle the part
+# was rotated by and the box (min_x, min_y, max_x, max_y) it occupies
+class Placement:
+    def __init__(self, part, sheet, angle, box):
+        self.part = part
+        self.sheet = sheet
+        self.angle = angle
+        self.box = box
+
+
+# The result of nesting a list of parts: one list of placements per sheet
+class NestingResult:
+    def __init__(self, sheet_width, sheet_height, spacing):
+        self.sheet_width = sheet_width
+        self.sheet_height = sheet_height
+        self.spacing = spacing
+        self.sheets = []
+
+    # Get all the placements, sheet after sheet
+    def get_placements(self):
+        return [placement for sheet in self.sheets for placement in sheet]
+
+    # Get the material usage of every sheet as a list of dictionaries
+    def get_sheet_usage(self):
+        return [sheet_usage([p.part for p in sheet], self.sheet_width, self.sheet_height) for sheet in self.sheets]
+
+    # Get the fraction of the material of all used sheets covered by parts
+    def get_utilization(self):
+        if not self.sheets:
+            return 0.0
+        part_area = sum(usage['part_area'] for usage in self.get_sheet_usage())
+        return part_area / (len(self.sheets) * self.sheet_width * self.sheet_height)
+
+    # Summarize the nesting as a dictionary
+    def report(self):
+        return {
+            'sheet_width': self.sheet_width,
+            'sheet_height': self.sheet_height,
+            'spacing': self.spacing,
+            'num_sheets': len(self.sheets),
+            'num_parts': len(self.get_placements()),
+            'utilization': self.get_utilization(),
+            'sheets': self.get_sheet_usage(),
+        }
+
+
+# Get the area of the outline of a Component or Shape
+def part_area(part):
+    if hasattr(part, 'get_mother_shape'):
+        return part.get_mother_shape().get_area()
+    return part.get_area()
+
+
+# Get the material usage of parts at their current position on a sheet:
+# the area of the parts, the width and height of the bed they use, and
+# the fraction of the sheet and of the used bed covered by parts.
+def sheet_usage(parts, sheet_width, sheet_height):
+    area = sum(part_area(part) for part in parts)
+    bed_width = bed_height = 0.0
+    for part in parts:
+        _, _, max_x, max_y = part.get_bounding_box()
+        bed_width = max(bed_width, max_x)
+        bed_height = max(bed_height, max_y)
+    bed_area = bed_width * bed_height
+    return {
+        'num_parts': len(parts),
+        'part_area': area,
+        'bed_width': bed_width,
+        'bed_height': bed_height,
+        'utilization': area / (sheet_width * sheet_height),
+        'bed_utilization': area / bed_area if bed_area else 0.0,
+    }
+
+
+# Get the width and height of the bounding box of a part rotated by the
+# given angle around its center, without rotating the part itself
+def rotated_extents(part, angle):
+    min_x, min_y, max_x, max_y = part.get_bounding_box()
+    if angle % 180 == 0:
+        return (max_x - min_x, max_y - min_y)
+    if angle % 90 == 0:
+        return (max_y - min_y, max_x - min_x)
+    outline = part.get_mother_shape() if hasattr(part, 'get_mother_shape') else part
+    cos_a = math.cos(math.radians(angle))
+    sin_a = math.sin(math.radians(angle))
+    xs = [x * cos_a - y * sin_a for x, y in outline.get_points()]
+    ys = [x * sin_a + y * cos_a for x, y in outline.get_points()]
+    return (max(xs) - min(xs), max(ys) - min(ys))
+
+
+# The free space of one sheet as a list of maximal free rectangles,
+# each stored as (x, y, width, height)
+class FreeSpace:
+    def __init__(self, x, y, width, height):
+        self.rects = [(x, y, width, height)]
+
+    # Find the bottom-left position for a box of the given size as
+    # (top, left) score and position, or None if it does not fit
+    def find(self, width, height):
+        best = None
+        for x, y, w, h in self.rects:
+            if width <= w and height <= h:
+                score = (y + height, x)
+                if best is None or score < best[0]:
+                    best = (score, x, y)
+        return best
+
+    # Mark a box as used and split the free rectangles around it
+    def place(self, x, y, width, height):
+        right = x + width
+        bottom = y + height
+        kept = []
+        split = []
+        for rect in self.rects:
+            fx, fy, fw, fh = rect
+            if x >= fx + fw or right <= fx or y >= fy + fh or bottom <= fy:
+                kept.append(rect)
+                continue
+            if x > fx:
+                split.append((fx, fy, x - fx, fh))
+            if right < fx + fw:
+                split.append((right, fy, fx + fw - right, fh))
+            if y > fy:
+                split.append((fx, fy, fw, y - fy))
+            if bottom < fy + fh:
+                split.append((fx, bottom, fw, fy + fh - bottom))
+        # Only the new rectangles can be contained in another one or
+        # contain an old one, so the pruning pass is limited to them
+        split = list(dict.fromkeys(split))
+        new = [r for r in split if not any(o != r and _contains(o, r) for o in split)]
+        new = [r for r in new if not any(_contains(o, r) for o in kept)]
+        kept = [o for o in kept if not any(_contains(r, o) for r in new)]
+        self.rects = kept + new
+
+
+# Find the best placement of a part on a sheet over its rotations as
+# (score, angle, width, height, x, y), or None if it does not fit
+def _best_fit(space, sizes, spacing):
+    best = None
+    for angle, w, h in sizes:
+        found = space.find(w + spacing, h + spacing)
+        if found is not None and (best is None or found[0] < best[0]):
+            best = (found[0], angle, w, h, found[1], found[2])
+    return best
+
+
+# Check whether rectangle a contains rectangle b
+def _contains(a, b):
+    return a[0] <= b[0] and a[1] <= b[1] and a[0] + a[2] >= b[0] + b[2] and a[1] + a[3] >= b[1] + b[3]
+
+
+# Nest parts onto as many sheets of the given size as needed. Each part
+# keeps at least spacing from the other parts and from the sheet edge.
+# The parts are rotated and moved in place and the placements are
+# returned as a NestingResult.
+def nest(parts, sheet_width, sheet_height, spacing=2, angles=(0, 90)):
+    if spacing < 0:
+        raise ValueError("Spacing must not be negative.")
+    result = NestingResult(sheet_width, sheet_height, spacing)
+    inner_width = sheet_width - 2 * spacing
+    inner_height = sheet_height - 2 * spacing
+    # Each part reserves its box plus the spacing on its right and bottom
+    # sides, and the free space of a sheet is widened by the same amount
+    spaces = []
+
+    candidates = []
+    for part in parts:
+        sizes = [(angle,) + rotated_extents(part, angle) for angle in angles]
+        sizes = [size for size in sizes if size[1] <= inner_width and size[2] <= inner_height]
+        if not sizes:
+            raise ValueError("Error: A part is larger than the sheet it is nested on.")
+        largest = max(w * h for _, w, h in sizes)
+        candidates.append((largest, part, sizes))
+    candidates.sort(key=lambda candidate: -candidate[0])
+
+    for _, part, sizes in candidates:
+        best = None
+        for index, space in enumerate(spaces):
+            fit = _best_fit(space, sizes, spacing)
+            if fit is not None:
+                best = (index,) + fit
+                break
+        if best is None:
+            spaces.append(FreeSpace(spacing, spacing, inner_width + spacing, inner_height + spacing))
+            result.sheets.append([])
+            best = (len(spaces) - 1,) + _best_fit(spaces[-1], sizes, spacing)
+        index, _, angle, w, h, x, y = best
+        spaces[index].place(x, y, w + spacing, h + spacing)
+        if angle % 360:
+            part.rotate(angle)
+        min_x, min_y, _, _ = part.get_bounding_box()
+        part.translate(x - min_x, y - min_y)
+        result.sheets[index].append(Placement(part, index, angle, part.get_bounding_box()))
+    return result
@@ -0,0 +1,266 @@
+import contextlib
+import functools
+import inspect
+import os
+import time
+
+# Instrumentation of the hot paths of Shape and Component, to see where a
+# slow build spends its time. While profiling is on, the operations in
+# OPERATIONS are replaced with wrappers that count their calls and the
+# points they handle and time them; turning it off puts the original
+# methods back, so profiling costs nothing while it is off.
+#
+# Time is attributed to the innermost operation running: the seconds of
+# an operation include the operations it calls, its self seconds do not,
+# and the seconds of a phase are the self seconds of its operations, so
+# the phases add up to the time spent in instrumented code.
+#
+# Profiling is turned on for the whole process by setting the environment
+# variable ORGANIZER_PROFILE to 1 before this module is imported, by
+# enable(), or for a block with profile().
+
+ENVIRONMENT_VARIABLE = 'ORGANIZER_PROFILE'
+
+
+# Count the points of the shape a method is called on
+def _shape_points(args, result):
+    return len(args[0].points)
+
+
+# Count the points a generator returned
+def _result_points(args, result):
+    return len(result) if result is not None else 0
+
+
+# Count the points of the shape added to a component
+def _added_points(args, result):
+    shape = args[1]
+    return len(shape.points) if hasattr(shape, 'points') else 0
+
+
+# The instrumented operations as (module, owner, name, phase, point
+# counter); owner is a class in the module, or None for a function of
+# the module itself
+OPERATIONS = [
+    ('component', 'Shape', 'complex_junction', 'junctions', _result_points),
+    ('component', 'Shape', 'generate_side_with_complex_junction', 'junctions', _result_points),
+    ('component', 'Shape', 'generate_rectangle_shelf', 'junctions', _result_points),
+    ('component', 'Shape', 'generate_rectangle_tower', 'junctions', _result_points),
+    ('component', 'Shape', 'generate_polygon_with_junctions', 'junctions', _result_points),
+    ('component', 'Component', 'generate_junction_holes', 'junctions', None),
+    ('component', 'Shape', 'move_to', 'layout', _shape_points),
+    ('component', 'Shape', 'translate', 'layout', _shape_points),
+    ('component', 'Shape', 'rotate', 'layout', _shape_points),
+    ('component', 'Shape', 'apply_transform', 'layout', _shape_points),
+    ('component', 'Shape', 'transformed', 'layout', _shape_points),
+    ('component', 'Component', 'move_to', 'layout', None),
+    ('component', 'Component', 'translate', 'layout', None),
+    ('component', 'Component', 'rotate', 'layout', None),
+    ('component', 'Component', 'bake', 'layout', None),
+    ('nesting', None, 'nest', 'layout', None),
+    ('component', 'Component', 'add_shape', 'containment', _added_points),
+    ('component', 'Component', 'add_component', 'containment', None),
+    ('component', 'Component', 'find_collisions', 'containment', None),
+    ('component', None, 'compensate_kerf', 'kerf', None),
+    ('component', 'Component', 'generate_text', 'decoration', None),
+    ('component', 'Component', 'embed_logo', 'decoration', None),
+    ('validate', None, 'validate_parts', 'validation', None),
+    ('component', 'Shape', 'iter_svg', 'svg', _shape_points),
+    ('component', 'Component', 'iter_svg', 'svg', None),
+    ('component', None, 'iter_svg_document', 'svg', None),
+]
+
+
+# The counters of one operation
+class OperationStats:
+    __slots__ = ('phase', 'calls', 'seconds', 'self_seconds', 'points')
+
+    def __init__(self, phase):
+        self.phase = phase
+        self.calls = 0
+        self.seconds = 0.0
+        self.self_seconds = 0.0
+        self.points = 0
+
+    # Describe the counters as a dictionary
+    def report(self):
+        return {
+            'phase': self.phase,
+            'calls': self.calls,
+            'seconds': self.seconds,
+            'self_seconds': self.self_seconds,
+            'points': self.points,
+        }
+
+
+# The counters of the operations run while a profile is current
+class Profile:
+    def __init__(self):
+        self.operations = {}
+        self.start = time.perf_counter()
+        self.end = None
+        # [start, seconds of the operations called] of every operation
+        # running, innermost last
+        self.stack = []
+
+    # Get the counters of an operation, creating them on first use
+    def operation(self, label, phase):
+        stats = self.operations.get(label)
+        if stats is None:
+            stats = self.operations[label] = OperationStats(phase)
+        return stats
+
+    # Describe the profile as a dictionary with the totals of every
+    # phase and the counters of every operation that was called
+    def report(self):
+        end = self.end if self.end is not None else time.perf_counter()
+        phases = {}
+        for stats in self.operations.values():
+            phase = phases.setdefault(stats.phase, {'calls': 0, 'seconds': 0.0, 'points': 0})
+            phase['calls'] += stats.calls
+            phase['seconds'] += stats.self_seconds
+            phase['points'] += stats.points
+        return {
+            'wall_seconds': end - self.start,
+            'instrumented_seconds': sum(phase['seconds'] for phase in phases.values()),
+            'phases': phases,
+            'operations': {label: stats.report() for label, stats in sorted(self.operations.items())},
+        }
+
+
+# The profile the wrappers record into, None while profiling is off
+_profile = None
+# (owner, name, original) of every wrapper installed
+_installed = []
+
+
+def _start(profile):
+    frame = [time.perf_counter(), 0.0]
+    profile.stack.append(frame)
+    return frame
+
+
+def _stop(profile, frame, stats):
+    elapsed = time.perf_counter() - frame[0]
+    stack = profile.stack
+    if stack and stack[-1] is frame:
+        stack.pop()
+    stats.seconds += elapsed
+    stats.self_seconds += elapsed - frame[1]
+    if stack:
+        stack[-1][1] += elapsed
+
+
+# Wrap a function so its calls are recorded in the current profile
+def _wrap(original, label, phase, count_points):
+    if inspect.isgeneratorfunction(original):
+        # Generators are timed while they run, not while they wait for
+        # the caller to ask for the next chunk
+        @functools.wraps(original)
+        def wrapper(*args, **kwargs):
+            profile = _profile
+            generator = original(*args, **kwargs)
+            if profile is None:
+                yield from generator
+                return
+            stats = profile.operation(label, phase)
+            stats.calls += 1
+            if count_points is not None:
+                stats.points += count_points(args, None)
+            while True:
+                frame = _start(profile) if _profile is profile else None
+                try:
+                    chunk = next(generator)
+                except StopIteration:
+                    return
+                finally:
+                    if frame is not None:
+                        _stop(profile, frame, stats)
+                yield chunk
+        return wrapper
+
+    @functools.wraps(original)
+    def wrapper(*args, **kwargs):
+        profile = _profile
+        if profile is None:
+            return original(*args, **kwargs)
+        stats = profile.operation(label, phase)
+        stats.calls += 1
+        frame = _start(profile)
+        try:
+            result = original(*args, **kwargs)
+        finally:
+            _stop(profile, frame, stats)
+        if count_points is not None:
+            stats.points += count_points(args, result)
+        return result
+    return wrapper
+
+
+def _install():
+    import importlib
+    for module_name, owner_name, name, phase, count_points in OPERATIONS:
+        module = importlib.import_module(module_name)
+        owner = module if owner_name is None else getattr(module, owner_name)
+        original = vars(owner)[name]
+        label = f"{owner_name or module_name}.{name}"
+        _installed.append((owner, name, original))
+        setattr(owner, name, _wrap(original, label, phase, count_points))
+
+
+def _uninstall():
+    while _installed:
+        owner, name, original = _installed.pop()
+        setattr(owner, name, original)
+
+
+# Check whether profiling is on
+def enabled():
+    return _profile is not None
+
+
+# Turn profiling on for the rest of the process, recording into a new
+# profile, and return the profile
+def enable():
+    global _profile
+    if _profile is None:
+        _profile = Profile()
+        _install()
+    return _profile
+
+
+# Turn profiling off and put the original methods back. Returns the
+# profile that was recorded, or None.
+def disable():
+    global _profile
+    profile = _profile
+    _profile = None
+    _uninstall()
+    if profile is not None:
+        profile.end = time.perf_counter()
+    return profile
+
+
+# Profile a block: the operations run in it are recorded in a new
+# profile, which is yielded. Profiling is turned on for the block if it
+# is off, and a profile that was current before is resumed after it.
+@contextlib.contextmanager
+def profile():
+    global _profile
+    previous = _profile
+    if previous is None:
+        current = enable()
+    else:
+        current = _profile = Profile()
+    try:
+        yield current
+    finally:
+        current.end = time.perf_counter()
+        if previous is None:
+            disable()
+        else:
+            _profile = previous
+
+
+if os.environ.get(ENVIRONMENT_VARIABLE, '') not in ('', '0'):
+    enable()
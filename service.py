@@ -0,0 +1,367 @@
+import argparse
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import assets
+import batch
+from component import write_svg_document
+from design import ORGANIZER_DEFAULTS
+
+# A long-running local service that renders desk organizers on request,
+# so an order does not pay for interpreter start-up and the geometry of
+# designs rendered before. It speaks a small subset of HTTP/1.1 over TCP
+# or a Unix socket:
+#
+#   POST /render   JSON object of parameters -> SVG document
+#   GET  /stats    cache and request counters as JSON
+#   GET  /health   "ok"
+#
+# The parameters are those of a batch row (see batch.PARAMETER_TYPES).
+# logo_file is only accepted when the service is given an asset
+# directory, and names a file inside it. Requests are normalized, so equivalent parameters share one cache
+# entry, identical requests in flight are rendered once, and rendering
+# runs in a process pool so the event loop stays responsive.
+
+# Options of batch.prepare_variant and their defaults, left out of the
+# cache key like the defaults of build_desk_organizer
+OPTION_DEFAULTS = {'plan_cuts': 0, 'curves': 0, 'precision': None, 'instances': 0, 'symbols': 0, 'validate': 1,
+                   'logo_file': None}
+
+MAX_BODY = 1 << 20
+# Header lines a request may have; lines longer than the stream limit
+# (64 KiB) are refused as well
+MAX_HEADERS = 100
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+           431: 'Request Header Fields Too Large',
+           422: 'Unprocessable Entity', 500: 'Internal Server Error'}
+
+
+# Get the cache key of a parameter object: the parsed values that differ
+# from their defaults, sorted by name. A logo_file is resolved against
+# asset_dir and refused when there is no asset directory or the path
+# leads out of it, so clients cannot read other files of the server.
+# The key also holds the version of the logo file, so a document is
+# rendered again once the logo changes.
+def normalize(params, asset_dir=None):
+    if not isinstance(params, dict):
+        raise ValueError("Parameters must be a JSON object")
+    parsed = batch.parse_row({name: value for name, value in params.items() if value is not None})
+    if 'logo_file' in parsed:
+        parsed['logo_file'] = resolve_asset(parsed['logo_file'], asset_dir)
+        parsed['logo_version'] = assets.asset_version(parsed['logo_file'])
+    defaults = dict(ORGANIZER_DEFAULTS, **OPTION_DEFAULTS)
+    key = tuple(sorted((name, value) for name, value in parsed.items()
+                       if name not in defaults or defaults[name] != value))
+    return key
+
+
+# Get the real path of a file named relative to the asset directory.
+# Raises ValueError when there is no asset directory or the file is not
+# inside it.
+def resolve_asset(name, asset_dir):
+    if asset_dir is None:
+        raise ValueError("logo_file is not accepted: the service has no asset directory")
+    root = os.path.realpath(asset_dir)
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f"logo_file must be inside the asset directory: {name}")
+    return path
+
+
+# Render the SVG document for a cache key. Runs in a worker process and
+# never raises, so exceptions that do not pickle stay in the worker:
+# returns (svg, None) or (None, (status, error)).
+def render(key):
+    record = {}
+    params = dict(key)
+    params.pop('logo_version', None)
+    try:
+        document, options = batch.prepare_variant(params, record)
+        file = io.StringIO()
+        write_svg_document(file, document, **options)
+        return file.getvalue(), None
+    except ValueError as e:
+        status = 422 if 'outline_errors' in record else 400
+        return None, (status, {'error': f"{type(e).__name__}: {e}", 'outline_errors': record.get('outline_errors')})
+    except Exception as e:
+        return None, (500, {'error': f"{type(e).__name__}: {e}"})
+
+
+# A least recently used cache of rendered documents, bounded by the
+# number of entries and their total size in characters
+class RenderCache:
+    def __init__(self, max_entries=256, max_size=64 * 2 ** 20):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    # Get the document for a key, or None
+    def get(self, key):
+        svg = self.entries.get(key)
+        if svg is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return svg
+
+    # Add a document, dropping the least recently used ones over the bounds
+    def put(self, key, svg):
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+        if len(svg) > self.max_size:
+            return
+        self.entries[key] = svg
+        self.size += len(svg)
+        while len(self.entries) > self.max_entries or self.size > self.max_size:
+            self.size -= len(self.entries.popitem(last=False)[1])
+
+    # Return the cache counters as a dictionary
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': len(self.entries),
+            'size': self.size,
+        }
+
+
+# Renders documents for requests: from the cache, by joining a render of
+# the same key that is already running, or in the worker pool
+class RenderService:
+    def __init__(self, workers=None, max_entries=256, max_size=64 * 2 ** 20, asset_dir=None):
+        self.cache = RenderCache(max_entries, max_size)
+        self.asset_dir = asset_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = self.__executor()
+        self.pending = {}
+        self.coalesced = 0
+        self.renders = 0
+        self.render_seconds = 0.0
+
+    # Get the SVG document for a parameter object as (svg, source), where
+    # source is 'hit', 'coalesced' or 'miss'. Raises RenderError when the
+    # parameters are invalid or the render fails.
+    async def render(self, params):
+        key = normalize(params, self.asset_dir)
+        svg = self.cache.get(key)
+        if svg is not None:
+            return svg, 'hit'
+        task = self.pending.get(key)
+        if task is None:
+            task = self.pending[key] = asyncio.ensure_future(self.__render(key))
+            source = 'miss'
+        else:
+            self.coalesced += 1
+            source = 'coalesced'
+        # A client that goes away does not cancel the render the others
+        # are waiting for
+        svg, error = await asyncio.shield(task)
+        if error is not None:
+            raise RenderError(*error)
+        return svg, source
+
+    # Forked workers would inherit the sockets of open connections and
+    # keep them open after the service closes them, so workers are spawned
+    def __executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    async def __render(self, key):
+        start = time.perf_counter()
+        executor = self.executor
+        try:
+            svg, error = await asyncio.get_running_loop().run_in_executor(executor, render, key)
+        except BrokenProcessPool as e:
+            # A worker died; start a new pool for the next requests
+            if self.executor is executor:
+                self.executor = self.__executor()
+            svg, error = None, (500, {'error': f"{type(e).__name__}: {e}"})
+        except Exception as e:
+            svg, error = None, (500, {'error': f"{type(e).__name__}: {e}"})
+        finally:
+            del self.pending[key]
+        self.renders += 1
+        self.render_seconds += time.perf_counter() - start
+        if svg is not None:
+            self.cache.put(key, svg)
+        return svg, error
+
+    # Return the cache and request counters as a dictionary
+    def stats(self):
+        stats = self.cache.stats()
+        stats['coalesced'] = self.coalesced
+        stats['renders'] = self.renders
+        stats['render_seconds'] = self.render_seconds
+        stats['in_flight'] = len(self.pending)
+        return stats
+
+    # Render the default design, so the first order does not pay for
+    # starting a worker and importing the geometry code
+    async def warm_up(self):
+        try:
+            await self.render({})
+        except RenderError:
+            pass
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+    # Serve one connection, answering requests until the client closes it
+    # or asks to
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, content_type, content, extra = await self.respond(method, path, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(response(status, content_type, content, extra, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except RequestError as e:
+            writer.write(response(e.status, 'application/json', json.dumps({'error': str(e)}), {}, False))
+        finally:
+            writer.close()
+
+    # Get the (status, content type, content, extra headers) of a request
+    async def respond(self, method, path, body):
+        if path == '/health':
+            return 200, 'text/plain', 'ok', {}
+        if path == '/stats':
+            return 200, 'application/json', json.dumps(self.stats()), {}
+        if path != '/render':
+            return 404, 'application/json', json.dumps({'error': f"Unknown path: {path}"}), {}
+        if method != 'POST':
+            return 405, 'application/json', json.dumps({'error': "Use POST with a JSON object"}), {'Allow': 'POST'}
+        try:
+            params = json.loads(body or b'{}')
+            svg, source = await self.render(params)
+        except RenderError as e:
+            return e.status, 'application/json', json.dumps(e.details), {}
+        except ValueError as e:
+            return 400, 'application/json', json.dumps({'error': f"{type(e).__name__}: {e}"}), {}
+        return 200, 'image/svg+xml', svg, {'X-Cache': source}
+
+
+# Raised when a document cannot be rendered, with the HTTP status and
+# the JSON details to answer with
+class RenderError(Exception):
+    def __init__(self, status, details):
+        self.status = status
+        self.details = details
+        super().__init__(details['error'])
+
+
+# Raised when a request cannot be read
+class RequestError(Exception):
+    def __init__(self, status, message):
+        self.status = status
+        super().__init__(message)
+
+
+# Read one line of a request. A line longer than the stream limit is
+# answered with status.
+async def read_line(reader, status, message):
+    try:
+        return await reader.readline()
+    except ValueError:
+        raise RequestError(status, message)
+
+
+# Read one HTTP request as (method, path, headers, body), or None when
+# the client closed the connection
+async def read_request(reader):
+    line = await read_line(reader, 400, "Request line too long")
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise RequestError(400, "Malformed request line")
+    headers = {}
+    count = 0
+    while True:
+        line = await read_line(reader, 431, "Header line too long")
+        if line in (b'\r\n', b'\n', b''):
+            break
+        count += 1
+        if count > MAX_HEADERS:
+            raise RequestError(431, "Too many header lines")
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length', 0) or 0)
+    except ValueError:
+        raise RequestError(400, "Malformed Content-Length")
+    if length < 0:
+        raise RequestError(400, "Malformed Content-Length")
+    if length > MAX_BODY:
+        raise RequestError(413, "Request body too large")
+    body = await reader.readexactly(length) if length else b''
+    return method.upper(), target.split('?', 1)[0], headers, body
+
+
+# Get the bytes of an HTTP response
+def response(status, content_type, content, extra=None, keep_alive=True):
+    body = content.encode('utf-8')
+    head = [f'HTTP/1.1 {status} {REASONS.get(status, "")}',
+            f'Content-Type: {content_type}; charset=utf-8',
+            f'Content-Length: {len(body)}',
+            'Connection: ' + ('keep-alive' if keep_alive else 'close')]
+    head += [f'{name}: {value}' for name, value in (extra or {}).items()]
+    return ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body
+
+
+# Run the service until it is stopped, on a Unix socket when socket_path
+# is given and on host:port otherwise
+async def serve(host='127.0.0.1', port=8765, socket_path=None, workers=None, max_entries=256, max_size=64 * 2 ** 20,
+                asset_dir=None):
+    service = RenderService(workers, max_entries, max_size, asset_dir)
+    await service.warm_up()
+    if socket_path is not None:
+        server = await asyncio.start_unix_server(service.handle, path=socket_path)
+        where = socket_path
+    else:
+        server = await asyncio.start_server(service.handle, host, port)
+        where = f"http://{host}:{port}"
+    print(f"Rendering desk organizers on {where}", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve desk organizer SVGs over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--socket', default=None, help="listen on this Unix socket instead of TCP")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="render processes (default: CPU count)")
+    parser.add_argument('--cache-entries', type=int, default=256, help="rendered documents kept in the cache")
+    parser.add_argument('--cache-mb', type=float, default=64, help="total size of the cached documents")
+    parser.add_argument('--assets', default=None, help="directory logo_file is read from (default: logos are refused)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.socket, args.workers, args.cache_entries, int(args.cache_mb * 2 ** 20),
+                          args.assets))
+    except KeyboardInterrupt:
+        pass
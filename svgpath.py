@@ -0,0 +1,136 @@
+# Compact SVG path encoding. Points are rounded to a grid of
+# 10^-precision (after scaling), repeated points and points on a straight
+# line between their neighbours are dropped, and the rest is written as
+# one absolute move followed by relative l/h/v steps in whole grid units,
+# so rounding errors never add up along the path. Every point of the
+# original outline stays within 10^-precision of the written path.
+
+# Largest distance, in grid units, a dropped point may be from the line
+# between the points kept around it. Together with the rounding of the
+# kept points (at most half a unit on each axis) this keeps the written
+# path within one unit of the original points.
+COLLINEAR_TOLERANCE = 0.25
+
+PATH_STYLE = 'style="fill:none;stroke:black;stroke-width:1"'
+
+# Most decimals a path can be written with; doubles hold no more for
+# coordinates of a few hundred millimetres
+MAX_PRECISION = 12
+
+
+# Check that precision is a whole number of decimals from 0 to
+# MAX_PRECISION, raising ValueError otherwise
+def check_precision(precision):
+    if int(precision) != precision or not 0 <= precision <= MAX_PRECISION:
+        raise ValueError(f"precision must be a whole number from 0 to {MAX_PRECISION}, not {precision}")
+
+
+# Format a number in grid units of 10^-precision with as few characters
+# as possible: no trailing zeros, no leading zero before the point. The
+# precision is not checked, it comes from simplify or format_number.
+def format_units(units, precision):
+    sign = '-' if units < 0 else ''
+    whole, fraction = divmod(abs(units), 10 ** precision)
+    if not fraction:
+        return sign + str(whole)
+    fraction = str(fraction).zfill(precision).rstrip('0')
+    return sign + (str(whole) if whole else '') + '.' + fraction
+
+
+# Format a number rounded to precision decimals
+def format_number(value, precision):
+    check_precision(precision)
+    return format_units(round(value * 10 ** precision), precision)
+
+
+# Get the distance from point p to the segment a-b
+def _segment_distance(p, a, b):
+    dx = b[0] - a[0]
+    dy = b[1] - a[1]
+    length = dx * dx + dy * dy
+    if length == 0:
+        return ((p[0] - a[0]) ** 2 + (p[1] - a[1]) ** 2) ** 0.5
+    t = max(0.0, min(1.0, ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / length))
+    x = a[0] + t * dx - p[0]
+    y = a[1] + t * dy - p[1]
+    return (x * x + y * y) ** 0.5
+
+
+# Round points to grid units and drop repeated points, the closing point
+# of a closed outline and points on the line between the kept points
+# around them. The first point is always kept.
+def simplify(points, precision, scaling_factor=1, closed=True):
+    check_precision(precision)
+    scale = scaling_factor * 10 ** precision
+    grid = []
+    for x, y in points:
+        point = (round(x * scale), round(y * scale))
+        if not grid or point != grid[-1]:
+            grid.append(point)
+    if closed and len(grid) > 1 and grid[0] == grid[-1]:
+        grid.pop()
+    if len(grid) < 3:
+        return grid
+    kept = [grid[0]]
+    skipped = []
+    for i in range(1, len(grid)):
+        point = grid[i]
+        following = grid[i + 1] if i + 1 < len(grid) else (grid[0] if closed else None)
+        if following is not None and following != kept[-1]:
+            # Drop the point if it and every point dropped since the last
+            # kept one lie on the line from the last kept point onwards
+            if all(_segment_distance(p, kept[-1], following) <= COLLINEAR_TOLERANCE for p in skipped + [point]):
+                skipped.append(point)
+                continue
+        kept.append(point)
+        skipped = []
+    return kept
+
+
+# Get the SVG path data of an outline: an absolute move to the first
+# point, then relative steps, closed with z for closed outlines
+def path_data(points, precision, scaling_factor=1, closed=True):
+    grid = simplify(points, precision, scaling_factor, closed)
+    if not grid:
+        return ''
+    x, y = grid[0]
+    parts = ['M', format_units(x, precision), format_units(y, precision)]
+    command = None
+    for next_x, next_y in grid[1:]:
+        dx = next_x - x
+        dy = next_y - y
+        if dy == 0:
+            step = ('h', format_units(dx, precision))
+        elif dx == 0:
+            step = ('v', format_units(dy, precision))
+        else:
+            step = ('l', format_units(dx, precision), format_units(dy, precision))
+        # A command letter repeats implicitly for the numbers that follow
+        if step[0] != command:
+            parts.append(step[0])
+            command = step[0]
+        parts.extend(step[1:])
+        x, y = next_x, next_y
+    if closed:
+        parts.append('z')
+    return _join(parts)
+
+
+# Join path tokens, leaving out the separators SVG does not need:
+# around command letters and before a minus sign
+def _join(parts):
+    text = parts[0]
+    previous = parts[0]
+    for part in parts[1:]:
+        if previous.isalpha() or part.isalpha() or part.startswith('-') or \
+           (part.startswith('.') and '.' in previous):
+            text += part
+        else:
+            text += ' ' + part
+        previous = part
+    return text
+
+
+# Get the SVG code of an outline as a compact path element
+def svg_path(points, precision, scaling_factor=1, closed=True):
+    return f'<path d="{path_data(points, precision, scaling_factor, closed)}" {PATH_STYLE}/>\n'
@@ -0,0 +1,225 @@
+import heapq
+import math
+
+from geometry import EPSILON, orientation, segments_intersect, signed_area
+
+# Validation of generated outlines before they are written. Every shape
+# is checked for edges that cross or touch other edges of the same
+# outline, for zero-length edges and for the wrong winding, so parameter
+# combinations that fold an outline over itself are caught before the
+# SVG reaches the cutter. Crossings are found with a sweep over x that
+# keeps the open edges in buckets by y, so only edges whose extents
+# overlap on both axes are tested, whichever way the outline lies. That
+# keeps the check cheap enough to run on every variant of a batch.
+
+# The sign of the signed area (geometry.signed_area) of every outline
+# the Shape generators make. An outline with the opposite sign, or no
+# area at all, has been turned inside out.
+WINDING = 1
+
+# Kinds of problems that make an outline unfit to cut. Zero-length
+# edges are harmless to the cutter (junctions start with a repeated
+# point) and are only reported.
+BLOCKING = ('too_few_points', 'self_intersection', 'winding')
+
+# Open edges that span more y buckets than this are kept in one list
+# instead, so a long edge does not have to be put into every bucket
+TALL_BUCKETS = 16
+
+# Outlines with fewer edges than this test each edge against all the
+# open edges, which is quicker than bucketing so few
+BUCKET_THRESHOLD = 64
+
+MESSAGES = {
+    'too_few_points': "has too few points",
+    'zero_length_edge': "has a zero-length edge",
+    'self_intersection': "intersects itself",
+    'winding': "is inverted or has no area",
+}
+
+
+# A problem with an outline: its kind (one of MESSAGES), the point where
+# it is, and the shape and component it was found in. When raised by
+# check_parts, problems lists every problem found in the parts.
+class OutlineError(ValueError):
+    def __init__(self, kind, point, shape=None, component=None):
+        self.kind = kind
+        self.point = point
+        self.shape = shape
+        self.component = component
+        self.problems = None
+        name = f"a shape of {component.name}" if component is not None else "The outline"
+        super().__init__(f"Error: {name} {MESSAGES[kind]} at ({point[0]:.4g}, {point[1]:.4g})")
+
+    # Describe the problem as a dictionary
+    def report(self):
+        return {
+            'kind': self.kind,
+            'point': list(self.point),
+            'component': self.component.name if self.component is not None else None,
+            'message': str(self),
+        }
+
+
+# Get the point two intersecting segments meet at
+def _meeting_point(p1, p2, q1, q2):
+    denominator = (p2[0] - p1[0]) * (q2[1] - q1[1]) - (p2[1] - p1[1]) * (q2[0] - q1[0])
+    if abs(denominator) > EPSILON:
+        t = ((q1[0] - p1[0]) * (q2[1] - q1[1]) - (q1[1] - p1[1]) * (q2[0] - q1[0])) / denominator
+        return (p1[0] + t * (p2[0] - p1[0]), p1[1] + t * (p2[1] - p1[1]))
+    # Collinear segments overlap at one of their ends
+    for point, a, b in ((p1, q1, q2), (p2, q1, q2), (q1, p1, p2)):
+        if segments_intersect(point, point, a, b):
+            return point
+    return q2
+
+
+# Get the vertex two neighbouring edges a-b and c-d share if they fold
+# back over each other there, otherwise None
+def _fold(a, b, c, d):
+    if b == c:
+        shared, first, second = b, a, d
+    else:
+        shared, first, second = a, b, c
+    if abs(orientation(shared, first, second)) <= EPSILON and \
+       (first[0] - shared[0]) * (second[0] - shared[0]) + (first[1] - shared[1]) * (second[1] - shared[1]) > 0:
+        return shared
+    return None
+
+
+# Get the points where the edges of a path without repeated points meet
+# edges other than their neighbours. The edges are swept in order of
+# their left ends. The edges still open at a left end are kept in
+# buckets of y as high as the median edge is long, so an edge is only
+# tested against the open edges in the buckets its y extent covers, and
+# against the few tall edges kept apart. A pair of edges sharing several
+# buckets is tested in the first one. Small outlines keep every open
+# edge with the tall ones.
+def self_intersections(points, closed=True):
+    n = len(points)
+    count = n if closed else n - 1
+    edges = []
+    for i in range(count):
+        a = points[i]
+        b = points[(i + 1) % n]
+        edges.append((min(a[0], b[0]), i, max(a[0], b[0]), min(a[1], b[1]), max(a[1], b[1]), a, b))
+    if not edges:
+        return []
+    edges.sort()
+    bucketed = count >= BUCKET_THRESHOLD
+    if bucketed:
+        sizes = sorted(max(max_x - min_x, max_y - min_y) for min_x, _, max_x, min_y, max_y, _, _ in edges)
+        height = max(sizes[len(sizes) // 2], EPSILON)
+    found = []
+    ending = []
+    # (first bucket, last bucket, min y, max y, a, b) of the open edges
+    open_edges = {}
+    buckets = {}
+    tall = {}
+    for min_x, i, max_x, min_y, max_y, a, b in edges:
+        while ending and ending[0][0] < min_x - EPSILON:
+            j = heapq.heappop(ending)[1]
+            first, last = open_edges.pop(j)[:2]
+            if last - first >= TALL_BUCKETS:
+                del tall[j]
+            else:
+                for bucket in range(first, last + 1):
+                    del buckets[bucket][j]
+        if bucketed:
+            first = math.floor((min_y - EPSILON) / height)
+            last = math.floor((max_y + EPSILON) / height)
+        else:
+            first, last = 0, TALL_BUCKETS
+        if last - first >= TALL_BUCKETS:
+            # Test a tall edge against every open edge, once each
+            candidates = [(j, open_edges[j]) for j in open_edges]
+        else:
+            candidates = [(j, other) for j, other in tall.items()]
+            for bucket in range(first, last + 1):
+                for j, other in buckets.get(bucket, {}).items():
+                    if bucket == first or other[0] == bucket:
+                        candidates.append((j, other))
+        for j, (_, _, other_min_y, other_max_y, c, d) in candidates:
+            if other_max_y < min_y - EPSILON or other_min_y > max_y + EPSILON:
+                continue
+            if abs(i - j) == 1 or (closed and abs(i - j) == count - 1):
+                fold = _fold(a, b, c, d)
+                if fold is not None:
+                    found.append(fold)
+            elif segments_intersect(a, b, c, d):
+                found.append(_meeting_point(a, b, c, d))
+        heapq.heappush(ending, (max_x, i))
+        edge = open_edges[i] = (first, last, min_y, max_y, a, b)
+        if last - first >= TALL_BUCKETS:
+            tall[i] = edge
+        else:
+            for bucket in range(first, last + 1):
+                buckets.setdefault(bucket, {})[i] = edge
+    return found
+
+
+# Check an outline and return its problems as a list of OutlineError
+# objects. A repeated closing point of a closed outline, exact or within
+# EPSILON, is not a zero-length edge. winding can be None to skip the
+# winding check.
+def find_outline_errors(points, closed=True, winding=WINDING, shape=None, component=None):
+    points = list(points)
+    if closed and len(points) > 1 and math.dist(points[0], points[-1]) <= EPSILON:
+        points.pop()
+    errors = []
+    path = []
+    for point in points:
+        if path and math.dist(path[-1], point) <= EPSILON:
+            errors.append(OutlineError('zero_length_edge', point, shape, component))
+        else:
+            path.append(point)
+    if closed and len(path) > 1 and math.dist(path[-1], path[0]) <= EPSILON:
+        errors.append(OutlineError('zero_length_edge', path.pop(), shape, component))
+    if len(path) < (3 if closed else 2):
+        errors.append(OutlineError('too_few_points', path[0] if path else (0, 0), shape, component))
+        return errors
+    # Several edges touching the same far edge report the same point
+    errors += [OutlineError('self_intersection', point, shape, component)
+               for point in dict.fromkeys(self_intersections(path, closed))]
+    if closed and winding is not None and signed_area(path) * winding <= EPSILON:
+        errors.append(OutlineError('winding', path[0], shape, component))
+    return errors
+
+
+# Check the mother shape, the shapes and the child components of a
+# component, in local coordinates
+def _component_errors(component, winding):
+    errors = []
+    mother = component.get_mother_shape(ignore_Error=True, local=True)
+    shapes = ([mother] if mother else []) + component.data['shapes']
+    for shape in shapes:
+        errors += find_outline_errors(shape.get_points(), True, winding, shape, component)
+    for child in component.data['components']:
+        errors += _component_errors(child, winding)
+    return errors
+
+
+# Check every outline of parts (Shapes or Components; rendered SVG
+# strings are skipped) and return the problems found
+def validate_parts(parts, winding=WINDING):
+    errors = []
+    for part in parts:
+        if isinstance(part, str):
+            continue
+        if hasattr(part, 'get_mother_shape'):
+            errors += _component_errors(part, winding)
+        else:
+            errors += find_outline_errors(part.get_points(), True, winding, part)
+    return errors
+
+
+# Check every outline of parts like validate_parts and return the
+# problems found. Raises the first blocking problem, with every problem
+# in its problems attribute, when an outline is unfit to cut.
+def check_parts(parts, winding=WINDING):
+    problems = validate_parts(parts, winding)
+    for problem in problems:
+        if problem.kind in BLOCKING:
+            problem.problems = problems
+            raise problem
+    return problems